@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
+import threading
+import time
 import urllib.parse
-from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import jsonio
 
 
 class AiError(RuntimeError):
@@ -20,6 +30,194 @@ class AiConfig:
     api_key: str
     model: str
     prompt: str
+    concurrency: int = 4  # 批量解析时同时在途的请求数
+    max_requests_per_minute: int = 0  # 0 表示不限速
+    stream: bool = False  # 以 SSE 流式接收，拿到完整 JSON 对象即提前断开
+    max_body_chars: int = 4000  # 发给模型的正文上限（0 表示不截断）
+    json_mode: Optional[bool] = None  # response_format=json_object；None 表示仅对 OpenAI 官方接口开启
+    headers: Dict[str, str] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.json_mode is None:
+            self.json_mode = "://api.openai.com/" in f"{self.base_url}/"
+        # 每次调用复用同一份请求头（不要在 repr 里带出 api_key）
+        self.headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json; charset=utf-8"}
+
+
+def _build_session() -> requests.Session:
+    """
+    模块级共享 Session：复用 TCP/TLS 连接（keep-alive），避免每封邮件都重新握手。
+    只对 429/503（服务端明确表示"没处理，稍后再试"）退避重试；重试耗尽后仍把最后一次响应交给调用方判断。
+    500/502/504 和读超时/连接中断时请求多半已被模型处理：重发会让调用方阻塞数倍 timeout 并重复计费，所以都不重试。
+    """
+    retry = Retry(
+        total=3,
+        read=0,
+        other=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 503],
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = _build_session()
+
+# 按 base_url 做简单的请求间隔限速（多线程共享）
+_THROTTLE_LOCK = threading.Lock()
+_THROTTLE_NEXT_AT: Dict[str, float] = {}
+
+
+def _throttle(cfg: AiConfig) -> None:
+    rpm = int(cfg.max_requests_per_minute or 0)
+    if rpm <= 0:
+        return
+    interval = 60.0 / rpm
+    with _THROTTLE_LOCK:
+        now = time.monotonic()
+        at = max(now, _THROTTLE_NEXT_AT.get(cfg.base_url, 0.0))
+        _THROTTLE_NEXT_AT[cfg.base_url] = at + interval
+    if at > now:
+        time.sleep(at - now)
+
+
+@lru_cache(maxsize=64)
+def _payload_prefix(
+    model: str,
+    system: str,
+    temperature: float,
+    stream: bool = False,
+    json_mode: bool = False,
+) -> bytes:
+    """
+    请求体里不随邮件变化的部分（model/temperature/system 消息）只序列化一次，
+    末尾留出 user 消息的位置：prefix + <user JSON 字符串> + _PAYLOAD_SUFFIX。
+    """
+    head_obj: Dict[str, Any] = {"model": model, "temperature": temperature}
+    if stream:
+        head_obj["stream"] = True
+    if json_mode:
+        # 服务端保证输出是合法 JSON 对象（所有 system prompt 都要求输出 JSON 对象，满足该模式的前提）
+        head_obj["response_format"] = {"type": "json_object"}
+    head_obj["messages"] = [{"role": "system", "content": system}]
+    head = jsonio.dumps(head_obj)
+    return head[:-2] + b',{"role":"user","content":'
+
+
+_PAYLOAD_SUFFIX = b"}]}"
+
+
+def _post_chat(cfg: AiConfig, system: str, user: str, *, temperature: float, timeout: int) -> requests.Response:
+    # 自己拼出请求体（UTF-8 原文，不做 \uXXXX 转义，请求体更小），绕过 requests 的 json= 路径
+    body = _payload_prefix(cfg.model, system, temperature, cfg.stream, bool(cfg.json_mode)) + jsonio.dumps(user) + _PAYLOAD_SUFFIX
+    _throttle(cfg)
+    return _SESSION.post(
+        f"{cfg.base_url}/chat/completions",
+        headers=cfg.headers,
+        data=body,
+        timeout=timeout,
+        stream=cfg.stream,
+    )
+
+
+def _read_stream_content(resp: requests.Response) -> str:
+    """
+    逐行读取 SSE（data: {...}），拼接 choices[0].delta.content。
+    一旦第一个顶层 JSON 值（对象 {...} 或批量回复可能用的裸数组 [...]）闭合
+    （按引号/转义感知的括号深度判断，{} 与 [] 共用一个深度）就提前断开连接。
+    """
+    parts: List[str] = []
+    depth = 0
+    started = in_str = escape = done = False
+    try:
+        for line in resp.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            try:
+                delta = jsonio.loads(data)["choices"][0]["delta"].get("content") or ""
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                continue
+            parts.append(delta)
+            for ch in delta:
+                if in_str:
+                    if escape:
+                        escape = False
+                    elif ch == "\\":
+                        escape = True
+                    elif ch == '"':
+                        in_str = False
+                elif ch == "{" or ch == "[":
+                    depth += 1
+                    started = True
+                elif not started:
+                    continue
+                elif ch == '"':
+                    in_str = True
+                elif ch == "}" or ch == "]":
+                    depth -= 1
+                    if depth == 0:
+                        done = True
+                        break
+            if done:
+                break
+    finally:
+        resp.close()
+    return "".join(parts)
+
+
+def _read_chat_content(resp: requests.Response) -> str:
+    # 服务端可能忽略 stream 参数直接返回普通 JSON：按 Content-Type 区分
+    if "text/event-stream" in resp.headers.get("Content-Type", ""):
+        return _read_stream_content(resp)
+    data = jsonio.loads(resp.content)
+    try:
+        return data["choices"][0]["message"]["content"]
+    except Exception:
+        raise AiError(f"Unexpected AI response: {_redact_secrets(json.dumps(data, ensure_ascii=False))[:500]}")
+
+
+# 各类调用的 system prompt（固定文本，模块加载时构造一次）
+_SYSTEM_ANALYZE = (
+    "你是一个严格的分类器。你必须只输出 JSON，对象字段必须包含："
+    "result, confidence, reason, signals。不要输出任何额外文本。"
+)
+_SYSTEM_ANALYZE_BATCH = (
+    "你是一个严格的分类器。输入是一个邮件数组，请对每封邮件分别分类。"
+    '你必须只输出 JSON 对象 {"results": [...]}：results 与输入数组一一对应、顺序一致、长度相同，'
+    "每个元素字段必须包含：index, result, confidence, reason, signals。不要输出任何额外文本。"
+)
+_SYSTEM_JIRA_DRAFT = (
+    "你是一个 Jira 工单撰写助手。你必须只输出 JSON（不要输出任何额外文本）。"
+    "JSON 必须包含 summary, description, labels 三个字段。"
+    "summary 简洁明确；description 用多行文本，包含问题/背景/复现(如有)/期望/建议处理；"
+    "labels 为 0~6 个短标签（英文或拼音均可），不包含空格。"
+    "不要包含任何 snippet 字段（输入里也没有）。"
+)
+_SYSTEM_REPLY = (
+    "你是一个客服回信助手。你必须只输出 JSON（不要输出任何额外文本）。"
+    "根据输入邮件正文的语言生成一封合理、礼貌、可直接发送的回信。"
+    "要求："
+    "1) reply 使用与邮件正文相同的语言；"
+    "2) 如果邮件正文不是中文，则额外提供 reply_zh（对 reply 的中文翻译参考）；如果是中文则 reply_zh 置空字符串；"
+    "3) 不要编造承诺（例如退款/时间点/功能已上线），需要时用‘我们会进一步确认/建议你提供更多信息’；"
+    "4) 回信要简洁但完整，包含致谢、回应要点、必要的澄清问题、下一步。"
+    "JSON 字段必须包含 language, reply, reply_zh。"
+)
+
+
+# openai keys: sk-...
+# include hyphens for sk-proj-... style keys
+_SK_RE = re.compile(r"\bsk-[A-Za-z0-9_\-]{8,}\b")
+# bearer token style
+_BEARER_RE = re.compile(r"(Bearer\s+)[A-Za-z0-9\-_\.]{8,}", re.IGNORECASE)
 
 
 def _redact_secrets(text: str) -> str:
@@ -28,14 +226,15 @@ def _redact_secrets(text: str) -> str:
     """
     if not text:
         return ""
-    # openai keys: sk-...
-    # include hyphens for sk-proj-... style keys
-    text = re.sub(r"\bsk-[A-Za-z0-9_\-]{8,}\b", "sk-***", text)
-    # bearer token style
-    text = re.sub(r"(Bearer\s+)[A-Za-z0-9\-_\.]{8,}", r"\1***", text, flags=re.IGNORECASE)
+    text = _SK_RE.sub("sk-***", text)
+    text = _BEARER_RE.sub(r"\1***", text)
     return text
 
 
+_OPENAI_HOST_URLS = ("https://api.openai.com", "http://api.openai.com")
+
+
+@lru_cache(maxsize=64)
 def normalize_openai_compatible_base_url(base_url: str) -> str:
     """
     容错：
@@ -50,6 +249,12 @@ def normalize_openai_compatible_base_url(base_url: str) -> str:
     if raw.endswith("/chat/completions"):
         raw = raw[: -len("/chat/completions")]
 
+    # 常见情况直接用字符串判断；只有 OpenAI 官方域名才需要补 /v1
+    if "api.openai.com" not in raw:
+        return raw.rstrip("/")
+    if raw in _OPENAI_HOST_URLS:
+        return raw + "/v1"
+
     try:
         u = urllib.parse.urlparse(raw)
         # only fix the canonical OpenAI host
@@ -63,6 +268,31 @@ def normalize_openai_compatible_base_url(base_url: str) -> str:
     return raw.rstrip("/")
 
 
+def ai_options_from_settings(ai: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    settings.ai 里的可选项：concurrency、max_requests_per_minute、stream、max_body_chars、json_mode（auto/on/off）。
+    """
+    try:
+        concurrency = int(ai.get("concurrency") or 4)
+    except (TypeError, ValueError):
+        concurrency = 4
+    try:
+        rpm = int(ai.get("max_requests_per_minute") or 0)
+    except (TypeError, ValueError):
+        rpm = 0
+    try:
+        max_body_chars = int(ai.get("max_body_chars") if ai.get("max_body_chars") not in (None, "") else 4000)
+    except (TypeError, ValueError):
+        max_body_chars = 4000
+    return {
+        "concurrency": max(1, min(concurrency, 16)),
+        "max_requests_per_minute": max(0, rpm),
+        "stream": bool(ai.get("stream")),
+        "max_body_chars": max(0, max_body_chars),
+        "json_mode": {"on": True, "off": False}.get(str(ai.get("json_mode") or "auto").strip().lower()),
+    }
+
+
 def ai_config_from_settings(settings: Dict[str, Any]) -> AiConfig:
     ai = settings.get("ai") if isinstance(settings.get("ai"), dict) else {}
     prompt = (settings.get("prompt") or "").strip()
@@ -81,7 +311,17 @@ def ai_config_from_settings(settings: Dict[str, Any]) -> AiConfig:
 
     if provider == "openai_compatible":
         base_url = normalize_openai_compatible_base_url(base_url)
-    return AiConfig(provider=provider, base_url=base_url.rstrip("/"), api_key=api_key, model=model, prompt=prompt)
+    return AiConfig(
+        provider=provider,
+        base_url=base_url.rstrip("/"),
+        api_key=api_key,
+        model=model,
+        prompt=prompt,
+        **ai_options_from_settings(ai),
+    )
+
+
+_JSON_DECODER = json.JSONDecoder()
 
 
 def _extract_json_from_text(text: str) -> Dict[str, Any]:
@@ -92,15 +332,144 @@ def _extract_json_from_text(text: str) -> Dict[str, Any]:
     if not text:
         raise AiError("Empty AI response")
     if text.startswith("{") and text.endswith("}"):
-        return json.loads(text)
-    # fallback: find first {...}
+        return jsonio.loads(text)
+    # fallback: 从第一个 { 起解析出一个完整对象，后面的多余文字直接忽略（一次扫描，不必再 rfind）
     start = text.find("{")
-    end = text.rfind("}")
-    if start >= 0 and end > start:
-        return json.loads(text[start : end + 1])
+    if start >= 0:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+        # 兜底：第一个 { 到最后一个 } 之间
+        end = text.rfind("}")
+        if end > start:
+            return jsonio.loads(text[start : end + 1])
     raise AiError(f"AI response is not JSON: {text[:200]}")
 
 
+def _chat_content(cfg: AiConfig, system: str, user: str, *, temperature: float, timeout: int = 60) -> str:
+    """
+    所有 chat-completions 调用的唯一出口：发请求、检查状态码、取出模型输出文本。
+    """
+    resp = _post_chat(cfg, system, user, temperature=temperature, timeout=timeout)
+    if resp.status_code >= 400:
+        raise AiError(f"AI request failed ({resp.status_code}): {_redact_secrets(resp.text)[:500]}")
+    return _read_chat_content(resp)
+
+
+def _chat_json(cfg: AiConfig, system: str, user: str, *, temperature: float, timeout: int = 60) -> Dict[str, Any]:
+    return _extract_json_from_text(_chat_content(cfg, system, user, temperature=temperature, timeout=timeout))
+
+
+# user 消息里 prompt 与邮件数据之间的分隔
+_USER_SEP = "\n\n【输入邮件】\n"
+_USER_SEP_BATCH = "\n\n【输入邮件列表】\n"
+
+# 分类结果缓存：同一 (model, prompt, 邮件字段) 直接复用上次结果（重复投递/转发/通知类邮件很常见）
+ANALYZE_CACHE_MAX = 2048
+_ANALYZE_CACHE: "OrderedDict[bytes, bytes]" = OrderedDict()
+_ANALYZE_CACHE_LOCK = threading.Lock()
+
+
+# 引用的历史邮件：以 "On ... wrote:" / "在 ... 写道：" 开头的行及其之后全部丢弃；以 ">" 开头的行丢弃
+_QUOTE_HEADER_RE = re.compile(r"^(On\s.+wrote:|在.+写道[:：])\s*$", re.MULTILINE)
+_QUOTED_LINE_RE = re.compile(r"^[ \t]*>.*(?:\n|$)", re.MULTILINE)
+_SPACES_RE = re.compile(r"[ \t\f\v]+")
+_LINE_EDGE_RE = re.compile(r" ?\n ?")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+# 截断时保留的首/尾比例（默认 4000 => 前 3000 + 后 1000）
+_TRIM_HEAD_RATIO = 0.75
+
+
+@lru_cache(maxsize=256)
+def _trim_body(text: str, max_chars: int) -> str:
+    """
+    减少发给模型的 token：去掉引用的回复链、压缩空白，超长时保留首尾窗口。
+    同一正文在 analyze/jira/reply 之间复用缓存结果。
+    """
+    if not text or max_chars <= 0:
+        return text
+    m = _QUOTE_HEADER_RE.search(text)
+    if m and m.start() > 0:
+        text = text[: m.start()]
+    text = _QUOTED_LINE_RE.sub("", text)
+    text = _LINE_EDGE_RE.sub("\n", _SPACES_RE.sub(" ", text))
+    text = _BLANK_LINES_RE.sub("\n\n", text).strip()
+    if len(text) <= max_chars:
+        return text
+    head = int(max_chars * _TRIM_HEAD_RATIO)
+    tail = max_chars - head
+    cut = len(text) - head - tail
+    return f"{text[:head]}\n[...truncated {cut} chars...]\n{text[-tail:] if tail else ''}"
+
+
+def _body_for_ai(cfg: AiConfig, email: Dict[str, Any]) -> Any:
+    body = email.get("body_text", "")
+    if isinstance(body, str):
+        return _trim_body(body, int(cfg.max_body_chars or 0))
+    return body
+
+
+# 发给模型的邮件字段（顺序即 JSON 中的顺序；body_text 单独截断后追加在最后）
+_ANALYZE_FIELDS = ("subject", "from", "date", "snippet")
+_DRAFT_FIELDS = ("subject", "from", "date")
+
+
+def _pick_fields(email: Dict[str, Any], keys: Tuple[str, ...]) -> Dict[str, Any]:
+    get = email.get
+    return {k: get(k, "") for k in keys}
+
+
+def _email_variables(cfg: AiConfig, email: Dict[str, Any]) -> Dict[str, Any]:
+    variables = _pick_fields(email, _ANALYZE_FIELDS)
+    variables["body_text"] = _body_for_ai(cfg, email)
+    return variables
+
+
+def _encode_variables(variables: Dict[str, Any]) -> str:
+    # 字段顺序固定（见 _email_variables），同一封邮件的编码结果稳定：既拼进 prompt，也用作缓存 key
+    return jsonio.dumps(variables).decode("utf-8")
+
+
+@lru_cache(maxsize=16)
+def _cache_key_base(model: str, prompt: str) -> Any:
+    # (model, prompt) 部分只哈希一次，之后每封邮件从这个状态 copy() 继续喂数据
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    h.update(b"\0")
+    return h
+
+
+def _analyze_cache_key(cfg: AiConfig, encoded: str) -> bytes:
+    h = _cache_key_base(cfg.model, cfg.prompt).copy()
+    h.update(encoded.encode("utf-8"))
+    # 仅用于进程内 LRU：直接用原始 digest bytes，省掉 hex 编码
+    return h.digest()
+
+
+def _analyze_cache_get(key: bytes) -> Optional[Dict[str, Any]]:
+    with _ANALYZE_CACHE_LOCK:
+        raw = _ANALYZE_CACHE.get(key)
+        if raw is None:
+            return None
+        _ANALYZE_CACHE.move_to_end(key)
+    # 存的是 JSON 文本：每次返回新对象，调用方可以放心修改
+    return jsonio.loads(raw)
+
+
+def _analyze_cache_put(key: bytes, out: Dict[str, Any]) -> None:
+    raw = jsonio.dumps(out)
+    with _ANALYZE_CACHE_LOCK:
+        _ANALYZE_CACHE[key] = raw
+        _ANALYZE_CACHE.move_to_end(key)
+        while len(_ANALYZE_CACHE) > ANALYZE_CACHE_MAX:
+            _ANALYZE_CACHE.popitem(last=False)
+
+
 def analyze_email_openai_compatible(cfg: AiConfig, email: Dict[str, Any]) -> Dict[str, Any]:
     """
     期望模型返回 JSON（字段不可缺失）：
@@ -111,43 +480,17 @@ def analyze_email_openai_compatible(cfg: AiConfig, email: Dict[str, Any]) -> Dic
         "signals": ["...", "..."]
       }
     """
-    url = f"{cfg.base_url}/chat/completions"
-    headers = {"Authorization": f"Bearer {cfg.api_key}", "Content-Type": "application/json"}
 
     # 把邮件字段打包给 prompt（你提供的规则在 cfg.prompt 里）
-    variables = {
-        "subject": email.get("subject", ""),
-        "from": email.get("from", ""),
-        "date": email.get("date", ""),
-        "snippet": email.get("snippet", ""),
-        "body_text": email.get("body_text", ""),
-    }
-    user_content = cfg.prompt.strip() + "\n\n【输入邮件】\n" + json.dumps(variables, ensure_ascii=False)
-
-    payload: Dict[str, Any] = {
-        "model": cfg.model,
-        "messages": [
-            {
-                "role": "system",
-                "content": (
-                    "你是一个严格的分类器。你必须只输出 JSON，对象字段必须包含："
-                    "result, confidence, reason, signals。不要输出任何额外文本。"
-                ),
-            },
-            {"role": "user", "content": user_content},
-        ],
-        "temperature": 0.2,
-    }
-
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
-    if resp.status_code >= 400:
-        raise AiError(f"AI request failed ({resp.status_code}): {_redact_secrets(resp.text)[:500]}")
-    data = resp.json()
-    try:
-        content = data["choices"][0]["message"]["content"]
-    except Exception:
-        raise AiError(f"Unexpected AI response: {_redact_secrets(json.dumps(data, ensure_ascii=False))[:500]}")
-    out = _extract_json_from_text(content)
+    encoded = _encode_variables(_email_variables(cfg, email))
+    cache_key = _analyze_cache_key(cfg, encoded)
+    cached = _analyze_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    user_content = "".join((cfg.prompt, _USER_SEP, encoded))
+
+    out = _chat_json(cfg, _SYSTEM_ANALYZE, user_content, temperature=0.2)
+    _analyze_cache_put(cache_key, out)
     return out
 
 
@@ -157,6 +500,106 @@ def analyze_email(cfg: AiConfig, email: Dict[str, Any]) -> Dict[str, Any]:
     raise AiError(f"Unsupported provider: {cfg.provider}")
 
 
+# 单次请求最多合并多少封邮件（太大容易超出上下文窗口）
+ANALYZE_BATCH_SIZE = 10
+
+
+def _extract_json_list_from_text(text: str, key: str = "results") -> List[Any]:
+    """
+    容错：优先按 {"results": [...]} 解析；否则截取第一段 [...] 数组。
+    """
+    text = (text or "").strip()
+    if not text:
+        raise AiError("Empty AI response")
+    if text.startswith("{"):
+        try:
+            obj = _extract_json_from_text(text)
+            if isinstance(obj.get(key), list):
+                return obj[key]
+        except (AiError, ValueError):
+            pass
+    start = text.find("[")
+    end = text.rfind("]")
+    if start >= 0 and end > start:
+        data = jsonio.loads(text[start : end + 1])
+        if isinstance(data, list):
+            return data
+    raise AiError(f"AI response is not a JSON array: {text[:200]}")
+
+
+def _analyze_chunk_openai_compatible(cfg: AiConfig, encoded: List[str]) -> List[Dict[str, Any]]:
+    """
+    encoded：每封邮件已编码好的 JSON 对象文本（_encode_variables），这里只在头部补上 index 后拼成数组。
+    """
+    items = ",".join(f'{{"index":{i},{enc[1:]}' for i, enc in enumerate(encoded))
+    user_content = "".join((cfg.prompt, _USER_SEP_BATCH, "[", items, "]"))
+
+    out = _extract_json_list_from_text(_chat_content(cfg, _SYSTEM_ANALYZE_BATCH, user_content, temperature=0.2, timeout=120))
+    if len(out) != len(encoded) or not all(isinstance(x, dict) for x in out):
+        raise AiError(f"AI batch response size mismatch: expected {len(encoded)}, got {len(out)}")
+    # 模型偶尔会打乱顺序：若 index 完整则按 index 对齐
+    if sorted(x.get("index") for x in out if isinstance(x.get("index"), int)) == list(range(len(encoded))):
+        out.sort(key=lambda x: x["index"])
+    for x in out:
+        x.pop("index", None)
+    return out
+
+
+def analyze_emails_batch(
+    cfg: AiConfig,
+    emails: List[Dict[str, Any]],
+    *,
+    batch_size: int = ANALYZE_BATCH_SIZE,
+) -> List[Dict[str, Any]]:
+    """
+    批量解析：每 batch_size 封合并为一次请求（多组并发），返回与输入顺序一致的结果列表。
+
+    某一组的响应无法对齐时，该组回退为逐封调用；单封仍失败则该位置返回 {"error": "..."}。
+    """
+    if cfg.provider != "openai_compatible":
+        raise AiError(f"Unsupported provider: {cfg.provider}")
+    batch_size = max(1, int(batch_size or 1))
+
+    def run_chunk(idxs: List[int]) -> List[Dict[str, Any]]:
+        if len(idxs) > 1:
+            try:
+                return _analyze_chunk_openai_compatible(cfg, [encoded[i] for i in idxs])
+            except Exception:
+                pass
+        out: List[Dict[str, Any]] = []
+        for i in idxs:
+            try:
+                out.append(analyze_email(cfg, emails[i]))
+            except Exception as e:
+                out.append({"error": str(e)})
+        return out
+
+    # 先查缓存，只把未命中的邮件发给模型
+    results: List[Optional[Dict[str, Any]]] = [None] * len(emails)
+    encoded = [_encode_variables(_email_variables(cfg, email)) for email in emails]
+    keys: List[bytes] = []
+    misses: List[int] = []
+    for i, enc in enumerate(encoded):
+        key = _analyze_cache_key(cfg, enc)
+        keys.append(key)
+        results[i] = _analyze_cache_get(key)
+        if results[i] is None:
+            misses.append(i)
+
+    idx_chunks = [misses[i : i + batch_size] for i in range(0, len(misses), batch_size)]
+    if idx_chunks:
+        # 各组请求互相独立：用线程池并发发出（受 cfg.concurrency 限制），map 保持输入顺序
+        workers = max(1, min(int(cfg.concurrency or 1), len(idx_chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outs = pool.map(run_chunk, idx_chunks)
+            for idxs, chunk_out in zip(idx_chunks, outs):
+                for i, out in zip(idxs, chunk_out):
+                    results[i] = out
+                    if "error" not in out:
+                        _analyze_cache_put(keys[i], out)
+    return [r or {} for r in results]
+
+
 def generate_jira_draft_openai_compatible(
     cfg: AiConfig,
     *,
@@ -172,58 +615,22 @@ def generate_jira_draft_openai_compatible(
         "labels": ["a", "b"]
       }
     """
-    url = f"{cfg.base_url}/chat/completions"
-    headers = {"Authorization": f"Bearer {cfg.api_key}", "Content-Type": "application/json"}
-
-    variables = {
-        "issue_type_name": issue_type_name,
-        "subject": email.get("subject", ""),
-        "from": email.get("from", ""),
-        "date": email.get("date", ""),
-        "body_text": email.get("body_text", ""),
-        "ai": ai_context or {},
-    }
 
-    system = (
-        "你是一个 Jira 工单撰写助手。你必须只输出 JSON（不要输出任何额外文本）。"
-        "JSON 必须包含 summary, description, labels 三个字段。"
-        "summary 简洁明确；description 用多行文本，包含问题/背景/复现(如有)/期望/建议处理；"
-        "labels 为 0~6 个短标签（英文或拼音均可），不包含空格。"
-        "不要包含任何 snippet 字段（输入里也没有）。"
-    )
-    user = "基于以下输入生成 Jira 工单草稿：\n" + json.dumps(variables, ensure_ascii=False)
+    variables: Dict[str, Any] = {"issue_type_name": issue_type_name, **_pick_fields(email, _DRAFT_FIELDS)}
+    variables["body_text"] = _body_for_ai(cfg, email)
+    variables["ai"] = ai_context or {}
 
-    payload: Dict[str, Any] = {
-        "model": cfg.model,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        "temperature": 0.3,
-    }
+    user = "基于以下输入生成 Jira 工单草稿：\n" + json.dumps(variables, ensure_ascii=False)
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
-    if resp.status_code >= 400:
-        raise AiError(f"AI request failed ({resp.status_code}): {_redact_secrets(resp.text)[:500]}")
-    data = resp.json()
-    try:
-        content = data["choices"][0]["message"]["content"]
-    except Exception:
-        raise AiError(f"Unexpected AI response: {_redact_secrets(json.dumps(data, ensure_ascii=False))[:500]}")
-    out = _extract_json_from_text(content)
+    out = _chat_json(cfg, _SYSTEM_JIRA_DRAFT, user, temperature=0.3)
 
     summary = str(out.get("summary") or "").strip()
     description = str(out.get("description") or "").strip()
     labels = out.get("labels")
     if not isinstance(labels, list):
         labels = []
-    labels2 = []
-    for x in labels:
-        s = str(x or "").strip()
-        if not s:
-            continue
-        if s not in labels2:
-            labels2.append(s)
+    # 去空、去重并保持原顺序
+    labels2 = list(dict.fromkeys(s for s in (str(x or "").strip() for x in labels) if s))
 
     if not summary:
         summary = str(email.get("subject") or "").strip() or "(no subject)"
@@ -245,46 +652,13 @@ def generate_reply_openai_compatible(
         "reply_zh": "..."    // 若原语言非中文，则提供中文翻译参考；否则空字符串
       }
     """
-    url = f"{cfg.base_url}/chat/completions"
-    headers = {"Authorization": f"Bearer {cfg.api_key}", "Content-Type": "application/json"}
-
-    variables = {
-        "subject": email.get("subject", ""),
-        "from": email.get("from", ""),
-        "date": email.get("date", ""),
-        "body_text": email.get("body_text", ""),
-    }
 
-    system = (
-        "你是一个客服回信助手。你必须只输出 JSON（不要输出任何额外文本）。"
-        "根据输入邮件正文的语言生成一封合理、礼貌、可直接发送的回信。"
-        "要求："
-        "1) reply 使用与邮件正文相同的语言；"
-        "2) 如果邮件正文不是中文，则额外提供 reply_zh（对 reply 的中文翻译参考）；如果是中文则 reply_zh 置空字符串；"
-        "3) 不要编造承诺（例如退款/时间点/功能已上线），需要时用‘我们会进一步确认/建议你提供更多信息’；"
-        "4) 回信要简洁但完整，包含致谢、回应要点、必要的澄清问题、下一步。"
-        "JSON 字段必须包含 language, reply, reply_zh。"
-    )
-    user = "基于以下输入生成回信：\n" + json.dumps(variables, ensure_ascii=False)
+    variables = _pick_fields(email, _DRAFT_FIELDS)
+    variables["body_text"] = _body_for_ai(cfg, email)
 
-    payload: Dict[str, Any] = {
-        "model": cfg.model,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        "temperature": 0.3,
-    }
+    user = "基于以下输入生成回信：\n" + json.dumps(variables, ensure_ascii=False)
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
-    if resp.status_code >= 400:
-        raise AiError(f"AI request failed ({resp.status_code}): {_redact_secrets(resp.text)[:500]}")
-    data = resp.json()
-    try:
-        content = data["choices"][0]["message"]["content"]
-    except Exception:
-        raise AiError(f"Unexpected AI response: {_redact_secrets(json.dumps(data, ensure_ascii=False))[:500]}")
-    out = _extract_json_from_text(content)
+    out = _chat_json(cfg, _SYSTEM_REPLY, user, temperature=0.3)
 
     language = str(out.get("language") or "").strip() or "unknown"
     reply = str(out.get("reply") or "").strip()
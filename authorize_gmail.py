@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import argparse
 import os
 import traceback
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -9,42 +10,77 @@ SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 CREDENTIALS_PATH = "secrets/gmail_credentials.json"
 TOKEN_PATH = "secrets/gmail_token.json"
 
-def main():
-    print("== Gmail OAuth (readonly) ==")
 
-    if not os.path.exists(CREDENTIALS_PATH):
-        raise FileNotFoundError(f"Missing {CREDENTIALS_PATH}")
+def _write_token(token_json: str, token_path: str) -> None:
+    # 先写临时文件再 os.replace：中途失败不会留下半个 token 文件
+    os.makedirs(os.path.dirname(token_path) or ".", exist_ok=True)
+    tmp = f"{token_path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(token_json)
+    os.replace(tmp, token_path)
+
+
+def _authorize_manual(flow: InstalledAppFlow):
+    auth_url, _ = flow.authorization_url(prompt="consent")
+    print("\nOpen this URL in your browser:\n")
+    print(auth_url)
+    code = input("\nPaste the code here: ").strip()
+
+    flow.fetch_token(code=code)
+    return flow.credentials
+
+
+def _authorize_local_server(flow: InstalledAppFlow, open_browser: bool):
+    # port=0：每次绑定一个临时端口，多个授权流程可以并行跑
+    return flow.run_local_server(
+        host="localhost",
+        port=0,
+        prompt="consent",
+        authorization_prompt_message="Please authorize Gmail access: {url}",
+        open_browser=open_browser,
+    )
+
+
+def main(
+    manual: bool = False,
+    open_browser: bool = True,
+    credentials_path: str = CREDENTIALS_PATH,
+    token_path: str = TOKEN_PATH,
+) -> None:
+    print("== Gmail OAuth (readonly) ==")
 
-    flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+    if not os.path.exists(credentials_path):
+        raise FileNotFoundError(f"Missing {credentials_path}")
 
-    # 1) 优先本地回调（通常会自动打开浏览器）
-    try:
-        print("Starting local server auth (should open browser)...")
-        creds = flow.run_local_server(
-            host="localhost",
-            port=0,
-            prompt="consent",
-            authorization_prompt_message="Please authorize Gmail access",
-            open_browser=True,
-        )
-    except Exception:
-        # 2) 如果本地回调失败，改用手动复制 URL
-        print("Local server auth failed. Falling back to manual URL.")
-        traceback.print_exc()
+    flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
 
-        auth_url, _ = flow.authorization_url(prompt="consent")
-        print("\nOpen this URL in your browser:\n")
-        print(auth_url)
-        code = input("\nPaste the code here: ").strip()
+    if manual:
+        # 手动复制 URL / code（会阻塞等待输入，仅在显式 --manual 时使用）
+        creds = _authorize_manual(flow)
+    else:
+        # 本地回调（通常会自动打开浏览器）；失败时不再阻塞等待 input()，直接提示改用 --manual
+        try:
+            print("Starting local server auth...")
+            creds = _authorize_local_server(flow, open_browser=open_browser)
+        except Exception:
+            traceback.print_exc()
+            raise SystemExit("Local server auth failed. Re-run with --manual to paste the code by hand.")
 
-        flow.fetch_token(code=code)
-        creds = flow.credentials
+    _write_token(creds.to_json(), token_path)
 
-    os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
-    with open(TOKEN_PATH, "w") as f:
-        f.write(creds.to_json())
+    print(f"\n✅ Success. Token saved to {token_path}")
 
-    print(f"\n✅ Success. Token saved to {TOKEN_PATH}")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--manual", action="store_true", help="手动复制授权 URL 并粘贴 code（不启动本地回调）")
+    ap.add_argument("--no-browser", action="store_true", help="不自动打开浏览器，只打印授权 URL")
+    ap.add_argument("--credentials", default=CREDENTIALS_PATH, help=f"OAuth client 文件（默认 {CREDENTIALS_PATH}）")
+    ap.add_argument("--token", default=TOKEN_PATH, help=f"token 输出路径（默认 {TOKEN_PATH}；多邮箱可各用一份）")
+    args = ap.parse_args()
+    main(
+        manual=args.manual,
+        open_browser=not args.no_browser,
+        credentials_path=args.credentials,
+        token_path=args.token,
+    )
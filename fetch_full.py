@@ -2,16 +2,21 @@ from __future__ import annotations
 
 import argparse
 import base64
-import json
 import os
+import random
 import re
+import time
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
 from google.oauth2.credentials import Credentials
 
+import jsonio
+
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 TOKEN_PATH = "secrets/gmail_token.json"
 
@@ -19,10 +24,59 @@ OUT_DIR = Path("out")
 EMAILS_DIR = OUT_DIR / "emails"
 ATTACH_DIR = OUT_DIR / "attachments"
 
+# 附件 base64 分段解码的段长（字符数，必须是 4 的倍数）：解码后约 48KB 一段写盘
+B64_DECODE_CHUNK = 64 * 1024
+
+# 一个 batch HTTP 请求里最多合并多少个子请求（Gmail 上限 100；官方建议不超过 50 以免触发限流）
+GMAIL_BATCH_SIZE = 50
+
+# batch 子请求被限流（429 / 403 rateLimitExceeded）时的重试：最多重试几轮，每轮等待 BACKOFF * 2^n 秒（加随机抖动）
+GMAIL_RATE_LIMIT_RETRIES = 5
+GMAIL_RATE_LIMIT_BACKOFF = 1.0
+
+# messages.get 的 partial response 掩码：只要 fetch_to_out / _parse_payload 读到的字段。
+# 子 part 的 headers（Content-Type 等重复信息）、sizeEstimate/historyId/internalDate/partId 都不再下发；
+# 第三层起的 parts 不再细分字段，保证任意深度的 MIME 树仍然完整。
+GMAIL_MESSAGE_FIELDS = (
+    "id,threadId,labelIds,snippet,"
+    "payload(headers,mimeType,filename,body,"
+    "parts(mimeType,filename,body,parts(mimeType,filename,body,parts)))"
+)
+
+_RE_UNSAFE = re.compile(r"[\\/:*?\"<>|]+")
+# very light HTML strip（见 _parse_payload）
+# 写法保证线性匹配：[^<>]* / [^<]* 不会越过定界符，避免嵌套 .*? 在畸形 HTML 上回溯
+_RE_SCRIPT_STYLE = re.compile(r"<(script|style)\b[^>]*>[^<]*(?:<(?!/\1\s*>)[^<]*)*</\1\s*>", re.I)
+_RE_BR = re.compile(r"<br\s*/?>", re.I)
+_RE_P_END = re.compile(r"</p\s*>", re.I)
+_RE_TAG = re.compile(r"<[^<>]*>")
+_RE_BLANK = re.compile(r"\n{3,}")
+
+
+class _JsonioModel(JsonModel):
+    """
+    googleapiclient 的 JsonModel，响应体改用 jsonio（orjson）解析；
+    messages.get / attachments.get（含 batch 子响应）都经过这里。
+    """
+
+    def deserialize(self, content):
+        try:
+            body = jsonio.loads(content)
+        except ValueError:
+            # 与 JsonModel 一致：不是 JSON 时原样返回文本
+            return content.decode("utf-8") if isinstance(content, bytes) else content
+        if self._data_wrapper and isinstance(body, dict) and "data" in body:
+            body = body["data"]
+        return body
+
+
+def _build_gmail_service(creds: Credentials):
+    return build("gmail", "v1", credentials=creds, model=_JsonioModel())
+
 
 def _safe_filename(name: str) -> str:
     name = name.strip()
-    name = re.sub(r"[\\/:*?\"<>|]+", "_", name)
+    name = _RE_UNSAFE.sub("_", name)
     return name[:200] if len(name) > 200 else name
 
 
@@ -30,6 +84,25 @@ def _b64url_decode(data: str) -> bytes:
     return base64.urlsafe_b64decode(data.encode("utf-8"))
 
 
+def _write_b64url(data: str, out_path: Path) -> int:
+    """
+    分段解码 base64url 并直接写入文件，返回写入的字节数。
+    不再先解码出整个附件的 bytes：峰值内存只多出一段（B64_DECODE_CHUNK）而不是整个附件。
+    """
+    size = 0
+    try:
+        with out_path.open("wb") as f:
+            for i in range(0, len(data), B64_DECODE_CHUNK):
+                chunk = base64.urlsafe_b64decode(data[i : i + B64_DECODE_CHUNK])
+                f.write(chunk)
+                size += len(chunk)
+    except Exception:
+        # 与原来"先解码后写盘"一致：解码失败不留下半个文件
+        out_path.unlink(missing_ok=True)
+        raise
+    return size
+
+
 def _get_header(headers: List[Dict[str, str]], key: str) -> str:
     key_lower = key.lower()
     for h in headers:
@@ -38,19 +111,52 @@ def _get_header(headers: List[Dict[str, str]], key: str) -> str:
     return ""
 
 
-def _extract_text_from_payload(payload: Dict[str, Any]) -> str:
+def _walk_parts(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
     """
-    Prefer text/plain; fallback to text/html (strip tags lightly).
+    按先序（与递归写法相同的顺序）遍历 MIME 树。
+    用显式栈代替递归：没有逐层的栈帧开销，异常深的嵌套也不会 RecursionError。
+    """
+    stack: List[Dict[str, Any]] = [payload]
+    while stack:
+        part = stack.pop()
+        yield part
+        children = part.get("parts")
+        if children:
+            stack.extend(reversed(children))
+
+
+def _header_map(headers: List[Dict[str, str]]) -> Dict[str, str]:
+    """
+    一次遍历建立 {小写 header 名: 值}，同名 header 取第一个（与 _get_header 一致）。
+    """
+    hmap: Dict[str, str] = {}
+    for h in reversed(headers):
+        hmap[h.get("name", "").lower()] = h.get("value", "")
+    return hmap
+
+
+def _parse_payload(payload: Dict[str, Any]) -> Tuple[str, List[Tuple[str, str, str]]]:
+    """
+    一次遍历 MIME 树，同时取出正文和待下载的附件。
+    Returns: (body_text, [(filename, mimeType, attachmentId), ...])
+
+    正文：Prefer text/plain; fallback to text/html (strip tags lightly).
     Gmail message payload is a MIME tree: payload + parts[] nested.
     """
     texts_plain: List[str] = []
     texts_html: List[str] = []
+    pending: List[Tuple[str, str, str]] = []
 
-    def walk(part: Dict[str, Any]) -> None:
+    for part in _walk_parts(payload):
         mime = part.get("mimeType", "")
         body = part.get("body", {}) or {}
         data = body.get("data")
 
+        filename = part.get("filename") or ""
+        attachment_id = body.get("attachmentId")
+        if attachment_id and filename:
+            pending.append((filename, mime, attachment_id))
+
         if mime == "text/plain" and data:
             try:
                 texts_plain.append(_b64url_decode(data).decode("utf-8", errors="replace"))
@@ -63,99 +169,177 @@ def _extract_text_from_payload(payload: Dict[str, Any]) -> str:
             except Exception:
                 pass
 
-        for child in part.get("parts", []) or []:
-            walk(child)
-
-    walk(payload)
-
     if texts_plain:
-        return "\n\n".join(t.strip() for t in texts_plain if t.strip())
+        return "\n\n".join(t.strip() for t in texts_plain if t.strip()), pending
 
     if texts_html:
         # very light HTML strip; good enough for triage
         html = "\n\n".join(texts_html)
-        text = re.sub(r"(?is)<(script|style).*?>.*?</\1>", "", html)
-        text = re.sub(r"(?is)<br\s*/?>", "\n", text)
-        text = re.sub(r"(?is)</p\s*>", "\n\n", text)
-        text = re.sub(r"(?is)<.*?>", "", text)
-        text = re.sub(r"\n{3,}", "\n\n", text)
-        return text.strip()
+        text = _RE_SCRIPT_STYLE.sub("", html)
+        text = _RE_BR.sub("\n", text)
+        text = _RE_P_END.sub("\n\n", text)
+        text = _RE_TAG.sub("", text)
+        text = _RE_BLANK.sub("\n\n", text)
+        return text.strip(), pending
 
-    return ""
+    return "", pending
 
 
 def _collect_attachments(
     service,
     user_id: str,
     msg_id: str,
-    payload: Dict[str, Any],
+    pending: List[Tuple[str, str, str]],
 ) -> List[Dict[str, Any]]:
     """
-    Download attachments to out/attachments/<msg_id>/<filename>
+    Download attachments (pending 来自 _parse_payload) to out/attachments/<msg_id>/<filename>
     Return metadata list.
     """
     attachments: List[Dict[str, Any]] = []
+    if not pending:
+        return attachments
+
+    # 同一封邮件的多个附件合并成一次 batch 请求下载
+    responses = _batch_execute(
+        service,
+        [
+            service.users().messages().attachments().get(userId=user_id, messageId=msg_id, id=attachment_id)
+            for _, _, attachment_id in pending
+        ],
+    )
 
-    def walk(part: Dict[str, Any]) -> None:
-        filename = part.get("filename") or ""
-        body = part.get("body", {}) or {}
-        attachment_id = body.get("attachmentId")
-        mime = part.get("mimeType", "")
+    for (filename, mime, attachment_id), (att, exc) in zip(pending, responses):
+        try:
+            if exc is not None:
+                raise exc
+            data = (att or {}).get("data")
+            if data:
+                out_folder = ATTACH_DIR / msg_id
+                out_folder.mkdir(parents=True, exist_ok=True)
+                out_path = out_folder / _safe_filename(filename)
+                size = _write_b64url(data, out_path)
 
-        if attachment_id and filename:
-            try:
-                att = (
-                    service.users()
-                    .messages()
-                    .attachments()
-                    .get(userId=user_id, messageId=msg_id, id=attachment_id)
-                    .execute()
-                )
-                data = att.get("data")
-                if data:
-                    content = _b64url_decode(data)
-                    out_folder = ATTACH_DIR / msg_id
-                    out_folder.mkdir(parents=True, exist_ok=True)
-                    out_path = out_folder / _safe_filename(filename)
-                    out_path.write_bytes(content)
-
-                    attachments.append(
-                        {
-                            "filename": filename,
-                            "mimeType": mime,
-                            "size": len(content),
-                            "saved_to": str(out_path),
-                            "attachmentId": attachment_id,
-                        }
-                    )
-            except Exception as e:
                 attachments.append(
                     {
                         "filename": filename,
                         "mimeType": mime,
-                        "error": str(e),
+                        "size": size,
+                        "saved_to": str(out_path),
                         "attachmentId": attachment_id,
                     }
                 )
+        except Exception as e:
+            attachments.append(
+                {
+                    "filename": filename,
+                    "mimeType": mime,
+                    "error": str(e),
+                    "attachmentId": attachment_id,
+                }
+            )
 
-        for child in part.get("parts", []) or []:
-            walk(child)
-
-    walk(payload)
     return attachments
 
 
-def _list_message_ids(service, user_id: str, query: Optional[str], max_results: Optional[int]) -> List[str]:
+def _is_rate_limited(exc: Optional[Exception]) -> bool:
+    if not isinstance(exc, HttpError):
+        return False
+    status = exc.resp.status
+    if status == 429:
+        return True
+    # Gmail 的用户级限流也可能以 403 返回：reason 为 rateLimitExceeded / userRateLimitExceeded
+    return status == 403 and (b"rateLimitExceeded" in exc.content or b"RateLimitExceeded" in exc.content)
+
+
+def _batch_execute(service, calls: List[Any]) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
     """
-    分页列出 message ids。若 max_results 为 None，则拉取所有页。
+    用 BatchHttpRequest 执行一组 API 请求（按 GMAIL_BATCH_SIZE 分组），
+    返回与输入顺序一致的 [(response, exception), ...]。
+
+    被限流的子请求（或整个 batch 被限流）指数退避后只重发这些请求，最多 GMAIL_RATE_LIMIT_RETRIES 轮；
+    其他失败不重试。整个 batch 请求失败时，该组每一项都记为同一个异常。
+    """
+    results: List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]] = [(None, None)] * len(calls)
+    missing = RuntimeError("no response in batch")
+    for start in range(0, len(calls), GMAIL_BATCH_SIZE):
+        todo = list(range(start, min(start + GMAIL_BATCH_SIZE, len(calls))))
+        for attempt in range(GMAIL_RATE_LIMIT_RETRIES + 1):
+            if attempt:
+                time.sleep(GMAIL_RATE_LIMIT_BACKOFF * (2 ** (attempt - 1)) + random.random())
+            got: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[Exception]]] = {}
+
+            def on_response(request_id: str, response: Optional[Dict[str, Any]], exception: Optional[Exception]) -> None:
+                got[request_id] = (response, exception)
+
+            batch = service.new_batch_http_request(callback=on_response)
+            for i in todo:
+                batch.add(calls[i], request_id=str(i))
+            try:
+                batch.execute()
+            except Exception as e:
+                got = {str(i): (None, e) for i in todo}
+            for i in todo:
+                results[i] = got.get(str(i), (None, missing))
+            todo = [i for i in todo if _is_rate_limited(results[i][1])]
+            if not todo:
+                break
+    return results
+
+
+def _prefetch_message_batches(
+    creds: Credentials,
+    chunks: Iterable[List[str]],
+) -> Iterator[Tuple[List[str], List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]]]:
+    """
+    每 GMAIL_BATCH_SIZE 封合并为一次 batch 请求（而不是逐封 get().execute()），
+    并在后台线程里预取下一组：调用方处理当前一组（解析正文/下载附件/写盘）时，下一组已经在路上。
+
+    只保持 1 个请求在途：Gmail 按用户限流，更高的并发只会换来 429。
+    后台线程使用独立的 service（googleapiclient 的 http 对象不是线程安全的）。
+
+    chunks 可以是惰性的（见 fetch_to_out）：取下一组时若触发列表分页请求，它与在途的 batch 请求重叠。
+    """
+    chunk_iter = iter(chunks)
+    current = next(chunk_iter, None)
+    if current is None:
+        return
+    fetch_service = _build_gmail_service(creds)
+
+    def fetch(ids: List[str]) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+        return _batch_execute(
+            fetch_service,
+            [
+                fetch_service.users().messages().get(userId="me", id=mid, format="full", fields=GMAIL_MESSAGE_FIELDS)
+                for mid in ids
+            ],
+        )
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(fetch, current)
+        while current is not None:
+            nxt = next(chunk_iter, None)
+            responses = future.result()
+            if nxt is not None:
+                future = pool.submit(fetch, nxt)
+            yield current, responses
+            current = nxt
+
+
+def _iter_message_ids(
+    service, user_id: str, query: Optional[str], max_results: Optional[int]
+) -> Iterator[List[str]]:
+    """
+    分页列出 message ids，每拿到一页就产出该页里新出现的 id（去重但保持顺序）。
+    若 max_results 为 None，则拉取所有页。
     """
-    ids: List[str] = []
+    seen: Dict[str, None] = {}
+    fetched = 0
     page_token: Optional[str] = None
 
     while True:
         page_size = 500
         if max_results is not None:
-            remaining = max_results - len(ids)
+            remaining = max_results - fetched
             if remaining <= 0:
                 break
             page_size = min(page_size, remaining)
@@ -168,20 +352,25 @@ def _list_message_ids(service, user_id: str, query: Optional[str], max_results:
         )
         resp = req.execute()
         msgs = resp.get("messages", []) or []
-        ids.extend([m["id"] for m in msgs if isinstance(m, dict) and m.get("id")])
+        ids = [m["id"] for m in msgs if isinstance(m, dict) and m.get("id")]
+        fetched += len(ids)
+
+        # dict 保留插入顺序：页内去重 + 跨页去重
+        new = [mid for mid in dict.fromkeys(ids) if mid not in seen]
+        if new:
+            seen.update(dict.fromkeys(new))
+            yield new
 
         page_token = resp.get("nextPageToken")
         if not page_token:
             break
 
-    # 去重但保持顺序
-    out: List[str] = []
-    seen = set()
-    for mid in ids:
-        if mid not in seen:
-            out.append(mid)
-            seen.add(mid)
-    return out
+
+def _list_message_ids(service, user_id: str, query: Optional[str], max_results: Optional[int]) -> List[str]:
+    """
+    分页列出 message ids。若 max_results 为 None，则拉取所有页。
+    """
+    return [mid for page in _iter_message_ids(service, user_id, query, max_results) for mid in page]
 
 
 def _build_query(label: Optional[str], raw_query: Optional[str], exclude_from_me: bool) -> Optional[str]:
@@ -208,6 +397,7 @@ def fetch_to_out(
     max_results: Optional[int] = None,
     include_from_me: bool = False,
     progress_cb: Optional[ProgressCallback] = None,
+    pretty: bool = False,
 ) -> Dict[str, Any]:
     """
     手动拉取入口（可被 Web/UI/脚本复用）。
@@ -215,6 +405,7 @@ def fetch_to_out(
     - label/query 会组合成 Gmail query
     - 默认排除你发出的邮件（-from:me -in:sent）
     - max_results=None 表示全量拉取
+    - pretty=True 时邮件 JSON 以 2 空格缩进写出（便于人工查看）
 
     progress_cb(done, total, msg_id, subject, error) 可用于展示进度。
     """
@@ -222,7 +413,7 @@ def fetch_to_out(
         raise FileNotFoundError(f"Missing {TOKEN_PATH}. Run authorize_gmail.py first.")
 
     creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
-    service = build("gmail", "v1", credentials=creds)
+    service = _build_gmail_service(creds)
 
     OUT_DIR.mkdir(exist_ok=True)
     EMAILS_DIR.mkdir(parents=True, exist_ok=True)
@@ -231,58 +422,75 @@ def fetch_to_out(
     q = _build_query(label, query, exclude_from_me=not include_from_me)
 
     try:
-        msg_ids = _list_message_ids(service, "me", query=q, max_results=max_results)
-        total = len(msg_ids)
-        print(f"Found {total} messages (query={q!r})")
+        msg_ids: List[str] = []
+
+        def id_chunks() -> Iterator[List[str]]:
+            # 边分页边切 chunk：第一页 id 回来就开始拉取正文，后续分页请求与 batch 拉取重叠。
+            # 因此 total 会随分页增长，直到列表拉完。
+            pending: List[str] = []
+            for page in _iter_message_ids(service, "me", q, max_results):
+                msg_ids.extend(page)
+                pending.extend(page)
+                while len(pending) >= GMAIL_BATCH_SIZE:
+                    yield pending[:GMAIL_BATCH_SIZE]
+                    del pending[:GMAIL_BATCH_SIZE]
+            print(f"Found {len(msg_ids)} messages (query={q!r})")
+            if pending:
+                yield pending
 
         done = 0
-        for msg_id in msg_ids:
-            subject = ""
-            err: Optional[str] = None
-            try:
-                full = (
-                    service.users()
-                    .messages()
-                    .get(userId="me", id=msg_id, format="full")
-                    .execute()
-                )
-
-                payload = full.get("payload", {}) or {}
-                headers = payload.get("headers", []) or []
-
-                subject = _get_header(headers, "Subject")
-                sender = _get_header(headers, "From")
-                date = _get_header(headers, "Date")
-
-                body_text = _extract_text_from_payload(payload)
-                attachments = _collect_attachments(service, "me", msg_id, payload)
-
-                record = {
-                    "id": full.get("id"),
-                    "threadId": full.get("threadId"),
-                    "labelIds": full.get("labelIds", []),
-                    "snippet": full.get("snippet", ""),
-                    "subject": subject,
-                    "from": sender,
-                    "date": date,
-                    "body_text": body_text,
-                    "attachments": attachments,
-                }
+        saved = 0
+        failed = 0
+        for chunk_ids, responses in _prefetch_message_batches(creds, id_chunks()):
+            for msg_id, (full, exc) in zip(chunk_ids, responses):
+                subject = ""
+                err: Optional[str] = None
+                try:
+                    if exc is not None:
+                        raise exc
+                    full = full or {}
+
+                    payload = full.get("payload", {}) or {}
+                    headers = payload.get("headers", []) or []
+
+                    hmap = _header_map(headers)
+                    subject = hmap.get("subject", "")
+                    sender = hmap.get("from", "")
+                    date = hmap.get("date", "")
+
+                    body_text, pending = _parse_payload(payload)
+                    attachments = _collect_attachments(service, "me", msg_id, pending)
+
+                    record = {
+                        "id": full.get("id"),
+                        "threadId": full.get("threadId"),
+                        "labelIds": full.get("labelIds", []),
+                        "snippet": full.get("snippet", ""),
+                        "subject": subject,
+                        "from": sender,
+                        "date": date,
+                        "body_text": body_text,
+                        "attachments": attachments,
+                    }
 
-                out_path = EMAILS_DIR / f"{msg_id}.json"
-                out_path.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+                    out_path = EMAILS_DIR / f"{msg_id}.json"
+                    # jsonio（orjson）直接产出 UTF-8 bytes，省掉 str -> bytes 的二次编码；缩进只在 pretty=True 时保留
+                    out_path.write_bytes(jsonio.dumps(record, indent=pretty))
+
+                    saved += 1
+                    print(f"- saved {msg_id}: {subject}  attachments={len(attachments)}")
+                except Exception as e:
+                    err = str(e)
+                    failed += 1
+                    print(f"- failed {msg_id}: {err}")
+                finally:
+                    done += 1
+                    if progress_cb:
+                        progress_cb(done, len(msg_ids), msg_id, subject, err)
 
-                print(f"- saved {msg_id}: {subject}  attachments={len(attachments)}")
-            except Exception as e:
-                err = str(e)
-                print(f"- failed {msg_id}: {err}")
-            finally:
-                done += 1
-                if progress_cb:
-                    progress_cb(done, total, msg_id, subject, err)
-
-        print(f"Done. Output in: {OUT_DIR.resolve()}")
-        return {"query": q, "total": total, "saved": total, "out_dir": str(OUT_DIR.resolve())}
+        total = len(msg_ids)
+        print(f"Done. saved={saved} failed={failed} total={total}. Output in: {OUT_DIR.resolve()}")
+        return {"query": q, "total": total, "saved": saved, "failed": failed, "out_dir": str(OUT_DIR.resolve())}
 
     except HttpError as e:
         print("Gmail API error:", e)
@@ -309,6 +517,7 @@ if __name__ == "__main__":
         action="store_true",
         help="包含我发出的邮件（默认会排除 -from:me -in:sent）",
     )
+    ap.add_argument("--pretty", action="store_true", help="邮件 JSON 以缩进格式写出（便于人工查看）")
     args = ap.parse_args()
 
     fetch_to_out(
@@ -316,4 +525,5 @@ if __name__ == "__main__":
         query=args.query,
         max_results=args.max_results,
         include_from_me=args.include_from_me,
+        pretty=args.pretty,
     )
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import time
+from typing import Dict, Optional, Tuple
 
 from google_auth_oauthlib.flow import Flow, InstalledAppFlow
 
@@ -10,22 +11,38 @@ SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 CREDENTIALS_PATH = "secrets/gmail_credentials.json"
 TOKEN_PATH = "secrets/gmail_token.json"
 
+# 文件是否存在的短时缓存：path -> (检查时间, 结果)。
+# 本进程内的写入/删除会主动失效；TTL 兜底其他进程（如 authorize_gmail.py）的改动。
+EXISTS_CACHE_TTL = 5.0
+_EXISTS_CACHE: Dict[str, Tuple[float, bool]] = {}
+
 
 class GmailAuthError(RuntimeError):
     pass
 
 
+def _cached_exists(path: str) -> bool:
+    now = time.monotonic()
+    hit = _EXISTS_CACHE.get(path)
+    if hit is not None and now - hit[0] < EXISTS_CACHE_TTL:
+        return hit[1]
+    exists = os.path.exists(path)
+    _EXISTS_CACHE[path] = (now, exists)
+    return exists
+
+
 def token_exists() -> bool:
-    return os.path.exists(TOKEN_PATH)
+    return _cached_exists(TOKEN_PATH)
 
 
 def credentials_exist() -> bool:
-    return os.path.exists(CREDENTIALS_PATH)
+    return _cached_exists(CREDENTIALS_PATH)
 
 
 def delete_token() -> None:
     if os.path.exists(TOKEN_PATH):
         os.remove(TOKEN_PATH)
+    _EXISTS_CACHE.pop(TOKEN_PATH, None)
 
 
 def build_flow_for_web(redirect_uri: str, state: Optional[str] = None) -> Flow:
@@ -51,4 +68,5 @@ def exchange_code_and_save_token(flow: Flow, code: str) -> None:
     os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
     with open(TOKEN_PATH, "w", encoding="utf-8") as f:
         f.write(creds.to_json())
+    _EXISTS_CACHE.pop(TOKEN_PATH, None)
 
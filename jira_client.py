@@ -2,10 +2,14 @@ from __future__ import annotations
 
 import base64
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import jsonio
 
 
 @dataclass
@@ -16,6 +20,11 @@ class JiraConfig:
     project_key: str
     issue_type_bug: str
     issue_type_task: str
+    # 由 email/api_token 派生，__post_init__ 中计算一次，每次请求直接复用
+    auth_header: str = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.auth_header = _basic_auth_header(self.email, self.api_token)
 
 
 class JiraError(RuntimeError):
@@ -79,6 +88,33 @@ def load_jira_config_from_env() -> JiraConfig:
     )
 
 
+def build_session() -> requests.Session:
+    """
+    模块级共享 Session：批量建单时复用 TCP/TLS 连接（keep-alive），不再每个请求都重新握手。
+    只对 429/503（Jira 明确表示"没处理，稍后再试"）退避重试，避免 5xx 时重复创建工单；
+    读超时/连接中断时请求可能已被 Jira 处理，POST 重发会建出重复工单，所以 read/other 不重试。
+    web 端（jira_client）和 mcp_jira_server 共用这一份。
+    """
+    retry = Retry(
+        total=3,
+        read=0,
+        other=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 503],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept": "application/json", "Content-Type": "application/json"})
+    return session
+
+
+_SESSION = build_session()
+
+
 def _basic_auth_header(email: str, api_token: str) -> str:
     raw = f"{email}:{api_token}".encode("utf-8")
     return "Basic " + base64.b64encode(raw).decode("utf-8")
@@ -105,12 +141,6 @@ def create_issue_v2(
     返回包含 key/self 等字段的 JSON。
     """
     url = f"{cfg.base_url}/rest/api/2/issue"
-    headers = {
-        "Authorization": _basic_auth_header(cfg.email, cfg.api_token),
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
-
     payload: Dict[str, Any] = {
         "fields": {
             "project": {"key": cfg.project_key},
@@ -121,11 +151,12 @@ def create_issue_v2(
         }
     }
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=30)
+    # Accept/Content-Type 已在 _SESSION 上设置，这里只需带上认证头
+    resp = _SESSION.post(url, headers={"Authorization": cfg.auth_header}, json=payload, timeout=30)
     if resp.status_code >= 400:
         # 不要回显 token；只返回状态码和响应文本（可能包含错误原因）
         raise JiraError(f"Jira create issue failed ({resp.status_code}): {resp.text}")
-    return resp.json()
+    return jsonio.loads(resp.content)
 
 
 def issue_browse_url(cfg: JiraConfig, issue_key: str) -> str:
@@ -0,0 +1,46 @@
+"""
+jsonio.py
+
+JSON 编解码的统一入口：装了 orjson 就用它（C 实现，解析/序列化更快、分配更少），
+没装则回退到标准库 json。输出始终是 UTF-8 原文（等价于 ensure_ascii=False）。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Union
+
+try:  # 可选依赖
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+HAS_ORJSON = orjson is not None
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            # orjson 更严格（例如不接受 NaN）；交给标准库兜底/给出原有的报错
+            pass
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+def dumps(obj: Any, *, indent: bool = False) -> bytes:
+    """
+    序列化为 UTF-8 bytes；indent=True 时为 2 空格缩进（与 json.dump(indent=2) 一致）。
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            # 不支持的类型（或超大整数）：回退到标准库，保持原有行为
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
@@ -12,14 +12,17 @@ Jira MCP Server (stdio)
 from __future__ import annotations
 
 import base64
-import json
 import os
 import sys
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
+import jsonio
+from jira_client import build_session
+
 
 # ========= 你稍后会在这里填入/更新 =========
 # 推荐做法：用环境变量（JIRA_*）注入；这里提供默认值占位。
@@ -38,6 +41,9 @@ class MCPError(Exception):
         self.data = data
 
 
+_SESSION = build_session()
+
+
 @dataclass
 class JiraCfg:
     base_url: str
@@ -45,6 +51,7 @@ class JiraCfg:
     api_token: str
 
 
+@lru_cache(maxsize=8)
 def _basic_auth_header(email: str, api_token: str) -> str:
     raw = f"{email}:{api_token}".encode("utf-8")
     return "Basic " + base64.b64encode(raw).decode("utf-8")
@@ -70,11 +77,8 @@ def _cfg_from_args(args: Dict[str, Any]) -> JiraCfg:
 
 
 def _jira_headers(cfg: JiraCfg) -> Dict[str, str]:
-    return {
-        "Authorization": _basic_auth_header(cfg.email, cfg.api_token),
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
+    # Accept/Content-Type 已在 _SESSION 上设置，这里只需带上认证头
+    return {"Authorization": _basic_auth_header(cfg.email, cfg.api_token)}
 
 
 def jira_create_issue(args: Dict[str, Any]) -> Dict[str, Any]:
@@ -105,11 +109,11 @@ def jira_create_issue(args: Dict[str, Any]) -> Dict[str, Any]:
         }
     }
 
-    resp = requests.post(url, headers=_jira_headers(cfg), json=payload, timeout=30)
+    resp = _SESSION.post(url, headers=_jira_headers(cfg), json=payload, timeout=30)
     if resp.status_code >= 400:
         raise MCPError(-32001, f"Jira create issue failed ({resp.status_code})", data=_safe_text(resp))
 
-    data = resp.json()
+    data = jsonio.loads(resp.content)
     key = data.get("key")
     if key:
         data["browse_url"] = f"{cfg.base_url}/browse/{key}"
@@ -133,10 +137,10 @@ def jira_get_issue(args: Dict[str, Any]) -> Dict[str, Any]:
             raise MCPError(-32602, "fields 必须是 string 或 string[]")
 
     url = f"{cfg.base_url}/rest/api/3/issue/{issue_key}{qp}"
-    resp = requests.get(url, headers=_jira_headers(cfg), timeout=30)
+    resp = _SESSION.get(url, headers=_jira_headers(cfg), timeout=30)
     if resp.status_code >= 400:
         raise MCPError(-32002, f"Jira get issue failed ({resp.status_code})", data=_safe_text(resp))
-    return resp.json()
+    return jsonio.loads(resp.content)
 
 
 def jira_search(args: Dict[str, Any]) -> Dict[str, Any]:
@@ -159,10 +163,10 @@ def jira_search(args: Dict[str, Any]) -> Dict[str, Any]:
 
     url = f"{cfg.base_url}/rest/api/3/search"
     payload = {"jql": jql, "maxResults": max_results_i, "fields": fields}
-    resp = requests.post(url, headers=_jira_headers(cfg), json=payload, timeout=30)
+    resp = _SESSION.post(url, headers=_jira_headers(cfg), json=payload, timeout=30)
     if resp.status_code >= 400:
         raise MCPError(-32003, f"Jira search failed ({resp.status_code})", data=_safe_text(resp))
-    return resp.json()
+    return jsonio.loads(resp.content)
 
 
 def _safe_text(resp: requests.Response) -> str:
@@ -176,8 +180,10 @@ def _safe_text(resp: requests.Response) -> str:
 # ========= MCP JSON-RPC plumbing =========
 
 def _send(obj: Dict[str, Any]) -> None:
-    sys.stdout.write(json.dumps(obj, ensure_ascii=False) + "\n")
-    sys.stdout.flush()
+    # 直接写 UTF-8 bytes，省掉 str -> 文本层编码的一次转换
+    out = sys.stdout.buffer
+    out.write(jsonio.dumps(obj) + b"\n")
+    out.flush()
 
 
 def _result(id_: Any, result: Any) -> None:
@@ -260,12 +266,13 @@ def _dispatch_tool(name: str, arguments: Dict[str, Any]) -> Any:
 
 def main() -> None:
     # MCP 初始化：接受 initialize，tools/list，tools/call 三类请求
-    for line in sys.stdin:
+    # 按行读取二进制 stdin，交给 jsonio（orjson）直接解析 bytes
+    for line in iter(sys.stdin.buffer.readline, b""):
         line = line.strip()
         if not line:
             continue
         try:
-            req = json.loads(line)
+            req = jsonio.loads(line)
         except Exception as e:
             _error(None, -32700, f"Parse error: {e}")
             continue
@@ -1,35 +1,61 @@
 from __future__ import annotations
 
-import json
 import os
-from datetime import datetime
-from typing import Any, Dict
+from datetime import datetime, timezone
+from typing import Any, Dict, Tuple
+
+import jsonio
 
 
 DEFAULT_SETTINGS_PATH = "out/settings.json"
 
+# path -> ((st_mtime_ns, st_size), 解析结果)；文件没变时 load_settings 直接复用，不再重复读盘/解析
+_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
+_UTC = timezone.utc
+
 
 def _utc_now() -> str:
-    return datetime.utcnow().isoformat() + "Z"
+    # 输出格式与原来的 utcnow().isoformat() + "Z" 相同
+    return datetime.now(_UTC).replace(tzinfo=None).isoformat() + "Z"
 
 
 def load_settings(path: str = DEFAULT_SETTINGS_PATH) -> Dict[str, Any]:
-    if not os.path.exists(path):
+    """
+    返回的是缓存结果的浅拷贝：顶层可随意改，嵌套的 dict（gmail/jira/ai）请只读。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
         return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _CACHE.get(path)
+    if cached is not None and cached[0] == stamp:
+        return dict(cached[1])
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {}
+        with open(path, "rb") as f:
+            data = jsonio.loads(f.read())
     except Exception:
         return {}
+    if not isinstance(data, dict):
+        return {}
+    _CACHE[path] = (stamp, data)
+    return dict(data)
 
 
 def save_settings(settings: Dict[str, Any], path: str = DEFAULT_SETTINGS_PATH) -> Dict[str, Any]:
     os.makedirs(os.path.dirname(path), exist_ok=True)
     payload = dict(settings)
     payload["updated_at"] = _utc_now()
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    _CACHE.pop(path, None)
+    # 先写临时文件并 fsync，再 os.replace：进程中途被杀也不会留下半个 settings.json（否则下次读到的是 {}）
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(jsonio.dumps(payload, indent=True))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
     return payload
 
 
@@ -14,21 +14,48 @@ from __future__ import annotations
 
 import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Optional, Tuple
 
 from triage_core import (
     discover_input_files,
-    dump_json,
+    dump_json_fast,
     ensure_dir,
     load_json,
     triage_one,
 )
 
 
+# 单封 triage 只要几十微秒，进程池启动就要十几毫秒；待处理文件少于这个数时即使给了 --workers 也串行
+PARALLEL_MIN_FILES = 1000
+
+
+def _triage_file(path: str, out_dir: str) -> Tuple[bool, str]:
+    """
+    处理单个文件（可在子进程中运行）。
+    Returns: (ok, message)；ok=False 表示 JSON 读取失败、未计入 processed。
+    """
+    try:
+        email = load_json(path)
+    except Exception as e:
+        return False, f"Skip (bad json): {path} -> {e}"
+
+    triaged = triage_one(email)
+    email_id = triaged.get("email_id") or os.path.splitext(os.path.basename(path))[0]
+    out_path = os.path.join(out_dir, f"{email_id}.triage.json")
+
+    # main() 已 ensure_dir(out_dir)，这里跳过逐封的 makedirs
+    dump_json_fast(out_path, triaged)
+    return True, f"triaged: {email_id} -> {out_path}"
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--input-glob", default="out/emails/*.json", help="e.g. out/emails/*.json")
     ap.add_argument("--output-dir", default="out/triage", help="e.g. out/triage")
     ap.add_argument("--max-results", type=int, default=50, help="limit processed emails")
+    ap.add_argument("--workers", type=int, default=1, help=f"并行进程数（默认 1 = 串行；待处理不足 {PARALLEL_MIN_FILES} 封时始终串行）")
     args = ap.parse_args()
 
     files = discover_input_files(args.input_glob)
@@ -40,23 +67,29 @@ def main() -> None:
     ensure_dir(out_dir)
 
     processed = 0
-    for path in files:
-        if processed >= args.max_results:
-            break
-
-        try:
-            email = load_json(path)
-        except Exception as e:
-            print(f"Skip (bad json): {path} -> {e}")
-            continue
-
-        triaged = triage_one(email)
-        email_id = triaged.get("email_id") or os.path.splitext(os.path.basename(path))[0]
-        out_path = os.path.join(out_dir, f"{email_id}.triage.json")
-
-        dump_json(out_path, triaged)
-        processed += 1
-        print(f"triaged: {email_id} -> {out_path}")
+    workers = max(1, args.workers)
+    pending = list(files)
+    # 文件之间互不依赖，交给进程池并行处理；
+    # 每轮只提交"还差几封"的文件数，坏文件不计数，因此结果与串行逐个处理完全一致（含输出顺序）
+    if min(len(files), args.max_results) < PARALLEL_MIN_FILES:
+        workers = 1
+    pool: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while pending and processed < args.max_results:
+            need = args.max_results - processed
+            batch, pending = pending[:need], pending[need:]
+            if pool is None:
+                results = map(_triage_file, batch, repeat(out_dir))
+            else:
+                chunksize = max(1, len(batch) // (workers * 4))
+                results = pool.map(_triage_file, batch, repeat(out_dir), chunksize=chunksize)
+            for ok, msg in results:
+                if ok:
+                    processed += 1
+                print(msg)
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
     print(f"Done. triaged={processed}, output_dir={out_dir}")
 
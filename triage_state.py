@@ -1,20 +1,39 @@
 from __future__ import annotations
 
-import json
 import os
-from datetime import datetime
-from typing import Any, Dict, Optional
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set
+
+import jsonio
 
 
 DEFAULT_TRIAGE_STATE_DIR = "out/triage_state"
 
 
+@lru_cache(maxsize=1)
+def _utc_second(sec: int) -> str:
+    # 同一秒内的多次状态写入共用同一个 "YYYY-MM-DDTHH:MM:SS" 前缀
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+
+
 def _utc_now() -> str:
-    return datetime.utcnow().isoformat() + "Z"
+    # 与 datetime.isoformat() + "Z" 的格式一致：微秒为 0 时不带小数部分
+    sec, us = divmod(time.time_ns() // 1000, 1_000_000)
+    if us:
+        return f"{_utc_second(sec)}.{us:06d}Z"
+    return f"{_utc_second(sec)}Z"
+
+
+# 本进程已确认存在的目录：每次 save_state 不再走 makedirs 的系统调用
+_CREATED_DIRS: Set[str] = set()
 
 
 def ensure_dir(path: str) -> None:
+    if path in _CREATED_DIRS:
+        return
     os.makedirs(path, exist_ok=True)
+    _CREATED_DIRS.add(path)
 
 
 def state_path(email_id: str, state_dir: str = DEFAULT_TRIAGE_STATE_DIR) -> str:
@@ -26,8 +45,8 @@ def load_state(email_id: str, state_dir: str = DEFAULT_TRIAGE_STATE_DIR) -> Opti
     if not os.path.exists(path):
         return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = jsonio.loads(f.read())
         if isinstance(data, dict):
             return data
         return None
@@ -41,11 +60,31 @@ def save_state(email_id: str, state: Dict[str, Any], state_dir: str = DEFAULT_TR
     state.setdefault("email_id", email_id)
     state["updated_at"] = _utc_now()
     path = state_path(email_id, state_dir=state_dir)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    try:
+        f = open(path, "wb")
+    except FileNotFoundError:
+        # 目录在运行期间被删掉了：作废缓存重建一次
+        _CREATED_DIRS.discard(state_dir)
+        ensure_dir(state_dir)
+        f = open(path, "wb")
+    with f:
+        f.write(jsonio.dumps(state, indent=True))
     return state
 
 
+def _apply_status(existing: Dict[str, Any], status: str) -> None:
+    status = (status or "").strip()
+    if status in {"todo", "pending"}:
+        existing["status"] = "pending"
+    elif status in {"skip", "ignore"}:
+        existing["status"] = "ignore"
+    elif status in {"done", "jira", "processed"}:
+        existing["status"] = "processed"
+        existing.setdefault("processed_at", _utc_now())
+    else:
+        existing["status"] = "pending"
+
+
 def set_status(
     email_id: str,
     status: str,
@@ -65,21 +104,39 @@ def set_status(
       - done/jira -> processed
     """
     existing = load_state(email_id, state_dir=state_dir) or {}
-    status = (status or "").strip()
-    if status in {"todo", "pending"}:
-        existing["status"] = "pending"
-    elif status in {"skip", "ignore"}:
-        existing["status"] = "ignore"
-    elif status in {"done", "jira", "processed"}:
-        existing["status"] = "processed"
-        existing.setdefault("processed_at", _utc_now())
-    else:
-        existing["status"] = "pending"
+    _apply_status(existing, status)
     if reason:
         existing["reason"] = reason
     return save_state(email_id, existing, state_dir=state_dir)
 
 
+def set_status_many(
+    email_ids: List[str],
+    status: str,
+    *,
+    state_dir: str = DEFAULT_TRIAGE_STATE_DIR,
+) -> int:
+    """
+    批量设置同一个状态（列表页的批量归档等）：
+    重复的 id 只处理一次；已经是目标状态的 state 文件不再重写。
+    返回实际写入的文件数。
+    """
+    written = 0
+    for email_id in dict.fromkeys(email_ids):
+        existing = load_state(email_id, state_dir=state_dir)
+        if existing is None:
+            existing = {}
+            before = None
+        else:
+            before = (existing.get("status"), existing.get("processed_at"))
+        _apply_status(existing, status)
+        if before == (existing.get("status"), existing.get("processed_at")):
+            continue
+        save_state(email_id, existing, state_dir=state_dir)
+        written += 1
+    return written
+
+
 def mark_processed(email_id: str, *, state_dir: str = DEFAULT_TRIAGE_STATE_DIR) -> Dict[str, Any]:
     existing = load_state(email_id, state_dir=state_dir) or {}
     existing["status"] = "processed"
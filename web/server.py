@@ -1,29 +1,40 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import hmac
 import json
 import os
+import sys
+import threading
 import uuid
 import urllib.parse
-from dataclasses import dataclass
-from datetime import datetime
-from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from email.utils import parseaddr, parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from fastapi import FastAPI, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from starlette.responses import PlainTextResponse
+from jinja2 import FileSystemBytecodeCache
+from starlette.responses import PlainTextResponse, Response
 from starlette.responses import JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 
+import jsonio
 from fetch_full import fetch_to_out
 from ai_client import (
     AiError,
     ai_config_from_settings,
-    analyze_email,
+    ai_options_from_settings,
+    analyze_emails_batch,
     generate_jira_draft_openai_compatible,
     generate_reply_openai_compatible,
     AiConfig,
@@ -38,6 +49,7 @@ from gmail_auth import (
     token_exists,
 )
 from jira_client import (
+    JiraConfig,
     JiraError,
     create_issue_v2,
     issue_browse_url,
@@ -45,20 +57,19 @@ from jira_client import (
     jira_config_from_dict,
     load_jira_config_from_env,
 )
-from settings_store import DEFAULT_SETTINGS_PATH, load_settings, merge_settings
+from settings_store import load_settings, merge_settings
 from triage_state import (
-    DEFAULT_TRIAGE_STATE_DIR,
     load_state,
     mark_processed,
     processing_status,
     set_jira_link,
     set_status,
+    set_status_many,
     upsert_ai_result,
     upsert_jira_draft,
     upsert_reply_draft,
 )
 from triage_core import (
-    discover_input_files,
     load_json,
     load_triage_for_id,
     triage_email_id,
@@ -72,10 +83,29 @@ EMAILS_DIR = OUT_DIR / "emails"
 TRIAGE_DIR = OUT_DIR / "triage"
 TRIAGE_STATE_DIR = OUT_DIR / "triage_state"
 ATTACHMENTS_DIR = OUT_DIR / "attachments"
+SETTINGS_PATH = str(OUT_DIR / "settings.json")
 READ_ONLY = bool(os.getenv("VERCEL")) or (os.getenv("READ_ONLY") == "1")
+PROFILE = os.getenv("PROFILE") == "1"
 
 
-app = FastAPI(title="Feedback Triage Bot - Web UI")
+# orjson 是可选依赖：装了就用 ORJSONResponse 序列化 JSON 响应，否则退回 starlette 的 JSONResponse
+_JSONResponse = ORJSONResponse if jsonio.HAS_ORJSON else JSONResponse
+
+# asyncio.to_thread 走的默认线程池只有 min(32, CPU+4) 个线程；这里跑的多是 Gmail/Jira/AI 网络请求和读写盘，
+# 单核机器上 5 个线程很容易被几个慢请求占满，连带状态写入也要排队
+IO_THREADS = 32
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="triage-io")
+    )
+    _warm_templates()
+    yield
+
+
+app = FastAPI(title="Feedback Triage Bot - Web UI", default_response_class=_JSONResponse, lifespan=_lifespan)
 
 # Session: “必须由用户点击登录才算已登录”
 app.add_middleware(
@@ -85,8 +115,89 @@ app.add_middleware(
     https_only=False,
 )
 
-templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
-templates.env.filters["tojson"] = lambda obj, **kwargs: json.dumps(obj, **kwargs)
+if PROFILE:
+    # 本地排查热点：PROFILE=1 启动后给任意页面加 ?profile=1，返回 pyinstrument 报告（需 pip install pyinstrument）
+    from pyinstrument import Profiler
+
+    @app.middleware("http")
+    async def _profile_request(request: Request, call_next):
+        if not request.query_params.get("profile"):
+            return await call_next(request)
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+# 编译后的模板字节码落到系统临时目录，冷启动时不再重新解析/编译模板
+try:
+    templates.env.bytecode_cache = FileSystemBytecodeCache()
+except (OSError, RuntimeError):
+    pass
+# 只读部署里模板不会变，省掉每次取模板时的 mtime 检查；本地开发仍自动重载
+templates.env.auto_reload = not READ_ONLY
+
+
+def _tojson(obj: Any, indent: Optional[int] = None, ensure_ascii: bool = True, **kwargs: Any) -> str:
+    # 模板里的用法（indent=2, ensure_ascii=False）走 jsonio/orjson；其他参数组合仍交给标准库
+    if not kwargs and not ensure_ascii and indent in (None, 2):
+        return jsonio.dumps(obj, indent=indent == 2).decode("utf-8")
+    return json.dumps(obj, indent=indent, ensure_ascii=ensure_ascii, **kwargs)
+
+
+templates.env.filters["tojson"] = _tojson
+
+
+def _warm_templates() -> None:
+    # 启动时把全部页面/partial 编译进 Jinja 的模板缓存（有字节码缓存时只是加载），第一次打开每个页面不再现场编译
+    for name in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(name)
+
+
+def _job_version(job: Any) -> str:
+    # 轮询的状态 partial 只依赖这几个字段：客户端带上次的版本号来问，没变化就回 204（HTMX 不替换、按原 URL 继续轮询）
+    return f"{job.done}.{job.total}.{int(job.finished)}.{int(bool(getattr(job, 'error', None)))}"
+
+
+templates.env.globals["job_version"] = _job_version
+
+
+# 进程级盐：重新部署/重启后模板可能变了，旧 ETag 一律失效
+_ETAG_SALT = uuid.uuid4().hex
+
+
+# 带 ETag 的页面各自用到的模板（含 extends/include 的），auto_reload 时只 stat 这几个文件
+_EMAILS_PAGE_TEMPLATES: Tuple[str, ...] = ("emails.html", "base.html", "partials/email_row.html")
+_EMAIL_VIEW_TEMPLATES: Tuple[str, ...] = ("email_view.html", "base.html")
+
+
+def _etag(template_names: Tuple[str, ...], *parts: Any) -> str:
+    """
+    弱 ETag：parts 要覆盖页面渲染用到的全部数据。
+    本地开发（auto_reload）时模板改了不会重启进程，再带上本页模板文件的修改时间。
+    """
+    if templates.env.auto_reload:
+        parts += tuple(os.stat(TEMPLATES_DIR / n).st_mtime_ns for n in template_names)
+    digest = hashlib.blake2b(repr((_ETAG_SALT,) + parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    # 浏览器带着同一个 ETag 来问时直接 304，不再渲染模板
+    inm = request.headers.get("if-none-match")
+    if inm and etag in (t.strip() for t in inm.split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def _with_etag(resp: Response, etag: str) -> Response:
+    resp.headers["ETag"] = etag
+    # no-cache：每次仍来校验，状态改了能立刻看到
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
 
 STATIC_DIR = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
@@ -114,7 +225,7 @@ async def _http_exception_handler(request: Request, exc: HTTPException):
             )
         return RedirectResponse(url="/", status_code=302)
     # 其他 HTTP 错误保持 JSON（便于调试）
-    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+    return _JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
 
 
 def _gmail_authed(request: Request) -> bool:
@@ -126,7 +237,7 @@ def _require_gmail_login(request: Request) -> None:
         raise HTTPException(status_code=401, detail="Not logged in")
 
 
-@dataclass
+@dataclass(slots=True)
 class EmailListItem:
     email_id: str
     subject: str
@@ -153,6 +264,19 @@ def _safe_str(x: Any) -> str:
         return ""
 
 
+_UTC = timezone.utc
+
+
+def _utc_now() -> str:
+    return datetime.now(_UTC).replace(tzinfo=None).isoformat() + "Z"
+
+
+@lru_cache(maxsize=1)
+def _parse_date_header(raw_date: str) -> Optional[datetime]:
+    # _format_date_display 与 _date_ts 对同一封邮件先后解析同一个 Date header：缓存最近一次结果
+    return parsedate_to_datetime(raw_date)
+
+
 def _format_date_display(raw_date: str, mtime: float) -> str:
     """
     首页时间显示：YYYY-MM-DD HH:MM
@@ -160,7 +284,7 @@ def _format_date_display(raw_date: str, mtime: float) -> str:
     """
     try:
         if raw_date:
-            dt = parsedate_to_datetime(raw_date)
+            dt = _parse_date_header(raw_date)
             if dt is not None:
                 # 保留时区信息的本地表示可能不一致，这里统一转为 naive 的本地时间字符串不好做；
                 # MVP：直接用 dt 的年月日时分（dt 若带 tz，strftime 会按本地转换或保留，足够用于“时间点”展示）。
@@ -178,33 +302,43 @@ def _date_ts(raw_date: str, fallback_ts: float) -> float:
     """
     try:
         if raw_date:
-            dt = parsedate_to_datetime(raw_date)
+            dt = _parse_date_header(raw_date)
             if dt is not None:
                 return float(dt.timestamp())
     except Exception:
         pass
     return float(fallback_ts)
 
-def _labels_from_text(text: str) -> List[str]:
-    parts = [p.strip() for p in (text or "").replace("\n", ",").split(",")]
-    out: List[str] = []
-    for p in parts:
-        if not p:
-            continue
-        if p not in out:
-            out.append(p)
-    return out
+
+# (settings["jira"] 对象, 下拉选项)：load_settings 在文件未变时返回同一个嵌套 dict，
+# 据此判断能否复用上次的结果（持有引用，不会因 id 复用误命中）
+_ISSUE_TYPES_CACHE: Optional[Tuple[Any, List[str]]] = None
 
 
 def _jira_issue_type_options() -> List[str]:
+    global _ISSUE_TYPES_CACHE
     # 仅用于 UI 下拉；真正创建时仍会校验完整配置
     try:
-        settings = load_settings(path=str(OUT_DIR / "settings.json"))
-        if isinstance(settings.get("jira"), dict):
-            cfg = jira_config_from_dict(settings["jira"])
-            return [cfg.issue_type_bug, cfg.issue_type_task]
+        jira = load_settings(path=SETTINGS_PATH).get("jira")
     except Exception:
-        pass
+        jira = None
+    if not isinstance(jira, dict):
+        jira = None
+    cached = _ISSUE_TYPES_CACHE
+    if cached is not None and cached[0] is jira:
+        return list(cached[1])
+    options = _jira_issue_type_options_uncached(jira)
+    _ISSUE_TYPES_CACHE = (jira, options)
+    return list(options)
+
+
+def _jira_issue_type_options_uncached(jira: Optional[Dict[str, Any]]) -> List[str]:
+    if jira is not None:
+        try:
+            cfg = jira_config_from_dict(jira)
+            return [cfg.issue_type_bug, cfg.issue_type_task]
+        except Exception:
+            pass
     try:
         cfg = load_jira_config_from_env()
         return [cfg.issue_type_bug, cfg.issue_type_task]
@@ -212,6 +346,37 @@ def _jira_issue_type_options() -> List[str]:
         return ["Bug", "Task"]
 
 
+_JIRA_CFG_CACHE: Optional[Tuple[Any, JiraConfig]] = None
+
+
+def _jira_config() -> JiraConfig:
+    """
+    创建工单用的 Jira 配置：优先从设置读取；没有（或不完整）再 fallback 环境变量，都缺时抛 JiraError。
+    与 _jira_issue_type_options 一样按 settings["jira"] 对象缓存，设置没变就复用同一个 JiraConfig。
+    """
+    global _JIRA_CFG_CACHE
+    jira = load_settings(path=SETTINGS_PATH).get("jira")
+    if not isinstance(jira, dict):
+        jira = None
+    cached = _JIRA_CFG_CACHE
+    if cached is not None and cached[0] is jira:
+        return cached[1]
+    cfg: Optional[JiraConfig] = None
+    if jira is not None:
+        try:
+            cfg = jira_config_from_dict(jira)
+        except JiraError:
+            cfg = None
+    if cfg is None:
+        cfg = load_jira_config_from_env()
+    _JIRA_CFG_CACHE = (jira, cfg)
+    return cfg
+
+
+def _default_issue_type(issue_type_options: List[str]) -> str:
+    return issue_type_options[1] if len(issue_type_options) > 1 else (issue_type_options[0] if issue_type_options else "Task")
+
+
 def _jira_defaults_for_email(email: Dict[str, Any], st: Dict[str, Any], issue_type_options: List[str]) -> Dict[str, str]:
     subject = _safe_str(email.get("subject") or "").strip() or "(no subject)"
     from_ = _safe_str(email.get("from") or "").strip()
@@ -240,10 +405,8 @@ def _jira_defaults_for_email(email: Dict[str, Any], st: Dict[str, Any], issue_ty
         ]
     ).strip()
 
-    default_issue_type = issue_type_options[1] if len(issue_type_options) > 1 else (issue_type_options[0] if issue_type_options else "Task")
-
     return {
-        "issue_type_name": default_issue_type,
+        "issue_type_name": _default_issue_type(issue_type_options),
         "summary": subject,
         "description": description,
         "labels": "",
@@ -272,11 +435,16 @@ def _jira_draft_from_state(st: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     }
 
 
-def _ai_cfg_for_jira(settings: Dict[str, Any]) -> AiConfig:
-    """
-    Jira 工单生成使用内置 prompt；不依赖用户在 settings 里填写的分类 prompt。
-    """
+# (settings["ai"] 对象, AiConfig)：与 _jira_config 一样按设置快照缓存
+_BUILTIN_AI_CFG_CACHE: Optional[Tuple[Any, AiConfig]] = None
+
+
+def _builtin_ai_cfg(settings: Dict[str, Any]) -> AiConfig:
+    global _BUILTIN_AI_CFG_CACHE
     ai = settings.get("ai") if isinstance(settings.get("ai"), dict) else {}
+    cached = _BUILTIN_AI_CFG_CACHE
+    if cached is not None and cached[0] is ai:
+        return cached[1]
     provider = (ai.get("provider") or "").strip() or "openai_compatible"
     base_url = (ai.get("base_url") or "").strip() or "https://api.openai.com/v1"
     api_key = (ai.get("api_key") or "").strip()
@@ -285,36 +453,120 @@ def _ai_cfg_for_jira(settings: Dict[str, Any]) -> AiConfig:
         raise AiError("Missing AI settings: AI api_key")
     if provider == "openai_compatible":
         base_url = normalize_openai_compatible_base_url(base_url)
-    return AiConfig(provider=provider, base_url=base_url.rstrip("/"), api_key=api_key, model=model, prompt="(builtin)")
+    cfg = AiConfig(
+        provider=provider,
+        base_url=base_url.rstrip("/"),
+        api_key=api_key,
+        model=model,
+        prompt="(builtin)",
+        **ai_options_from_settings(ai),
+    )
+    _BUILTIN_AI_CFG_CACHE = (ai, cfg)
+    return cfg
+
+
+def _ai_cfg_for_jira(settings: Dict[str, Any]) -> AiConfig:
+    """
+    Jira 工单生成使用内置 prompt；不依赖用户在 settings 里填写的分类 prompt。
+    """
+    return _builtin_ai_cfg(settings)
 
 
 def _ai_cfg_for_reply(settings: Dict[str, Any]) -> AiConfig:
     """
     回信生成使用内置 prompt；不依赖 settings.prompt。
     """
-    ai = settings.get("ai") if isinstance(settings.get("ai"), dict) else {}
-    provider = (ai.get("provider") or "").strip() or "openai_compatible"
-    base_url = (ai.get("base_url") or "").strip() or "https://api.openai.com/v1"
-    api_key = (ai.get("api_key") or "").strip()
-    model = (ai.get("model") or "").strip() or "gpt-4o-mini"
-    if not api_key:
-        raise AiError("Missing AI settings: AI api_key")
-    if provider == "openai_compatible":
-        base_url = normalize_openai_compatible_base_url(base_url)
-    return AiConfig(provider=provider, base_url=base_url.rstrip("/"), api_key=api_key, model=model, prompt="(builtin)")
+    return _builtin_ai_cfg(settings)
 
 
 def _triage_path(email_id: str) -> Path:
     return TRIAGE_DIR / f"{email_id}.triage.json"
 
 
-def _status_for_email(email_id: str) -> str:
-    st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR))
+def _raw_status(st: Optional[Dict[str, Any]]) -> str:
     if isinstance(st, dict) and st.get("status"):
         return str(st.get("status"))
     return "todo"
 
 
+def _status_for_email(email_id: str) -> str:
+    return _raw_status(load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)))
+
+
+# state 文件缓存：path -> ((st_mtime_ns, st_size), (status, processing_status))。
+# state 会被原地改写，按文件签名判断是否重读；列表只用到这两个状态，缓存时就算好
+_STATE_CACHE: Dict[str, Tuple[Tuple[int, int], Tuple[str, str]]] = {}
+_STATE_SUFFIX = ".state.json"
+_TRIAGE_SUFFIX = ".triage.json"
+
+
+def _load_all_statuses() -> Dict[str, Tuple[str, str]]:
+    """
+    一次 scandir 读出全部 state：email_id -> (status, processing_status)；没变过的文件复用上次的结果。
+    """
+    statuses: Dict[str, Tuple[str, str]] = {}
+    try:
+        it = os.scandir(TRIAGE_STATE_DIR)
+    except OSError:
+        return statuses
+    seen: Set[str] = set()
+    with it:
+        for entry in it:
+            if not entry.name.endswith(_STATE_SUFFIX):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            key = (st.st_mtime_ns, st.st_size)
+            email_id = entry.name[: -len(_STATE_SUFFIX)]
+            seen.add(entry.path)
+            cached = _STATE_CACHE.get(entry.path)
+            if cached is not None and cached[0] == key:
+                pair = cached[1]
+            else:
+                state = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR))
+                # 状态只有少数几种取值：intern 后全部列表项共用同一个 str，筛选比较也走指针相等的快路径
+                pair = (sys.intern(_raw_status(state)), sys.intern(processing_status(state)))
+                _STATE_CACHE[entry.path] = (key, pair)
+            statuses[email_id] = pair
+    for stale in _STATE_CACHE.keys() - seen:
+        _STATE_CACHE.pop(stale, None)
+    return statuses
+
+
+def _triage_ids() -> Set[str]:
+    try:
+        with os.scandir(TRIAGE_DIR) as it:
+            return {e.name[: -len(_TRIAGE_SUFFIX)] for e in it if e.name.endswith(_TRIAGE_SUFFIX)}
+    except OSError:
+        return set()
+
+
+# 没有 state 文件（或读不出来）时的 (status, processing_status)
+_NO_STATE: Tuple[str, str] = (_raw_status(None), processing_status(None))
+
+
+def _state_fields(
+    email_id: str,
+    statuses: Optional[Dict[str, Tuple[str, str]]] = None,
+    triage_ids: Optional[Set[str]] = None,
+) -> Tuple[bool, str, str]:
+    """
+    列表项里随 triage/state 变化的部分：(triage_exists, status, processing_status)。
+    传入预先批量读好的 statuses/triage_ids 时不再逐封访问磁盘。
+    """
+    if triage_ids is not None:
+        triage_exists = email_id in triage_ids
+    else:
+        triage_exists = _triage_path(email_id).exists()
+    if statuses is not None:
+        raw_status, pstatus = statuses.get(email_id, _NO_STATE)
+        return triage_exists, raw_status, pstatus
+    st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR))
+    return triage_exists, _raw_status(st), processing_status(st)
+
+
 def _is_candidate(triage: Optional[Dict[str, Any]]) -> bool:
     """
     “值得进 Jira”候选：只基于现有 triage 结果，不修改 triage 能力。
@@ -326,15 +578,22 @@ def _is_candidate(triage: Optional[Dict[str, Any]]) -> bool:
     return c in {"bug", "feature_request", "account_support"}
 
 
-def _parse_email_file(path: str) -> Tuple[EmailListItem, Dict[str, Any]]:
+def _parse_email_file(
+    path: str,
+    statuses: Optional[Dict[str, Tuple[str, str]]] = None,
+    triage_ids: Optional[Set[str]] = None,
+    mtime: Optional[float] = None,
+) -> Tuple[EmailListItem, Dict[str, Any]]:
     """
     返回 (列表展示字段, 完整 email dict)。尽量容错：坏 JSON 也能显示占位。
+    mtime 由调用方传入时不再 stat 一次。
     """
-    mtime = 0.0
-    try:
-        mtime = os.path.getmtime(path)
-    except Exception:
-        pass
+    if mtime is None:
+        mtime = 0.0
+        try:
+            mtime = os.path.getmtime(path)
+        except Exception:
+            pass
 
     email_id = os.path.splitext(os.path.basename(path))[0]
     email: Dict[str, Any] = {}
@@ -348,20 +607,19 @@ def _parse_email_file(path: str) -> Tuple[EmailListItem, Dict[str, Any]]:
     from_email = _safe_str(email.get("from") or email.get("from_email") or email.get("sender")) or "(unknown)"
     # from_name: 仅用于展示（不影响原始字段）
     try:
-        from email.utils import parseaddr
         name, addr = parseaddr(from_email)
         from_name = name or addr or from_email
     except Exception:
         from_name = from_email
+    # 同一发件人的邮件很多：列表缓存里共用同一个 str
+    from_email = sys.intern(from_email)
+    from_name = sys.intern(from_name)
     date = _safe_str(email.get("date")) or ""
     date_display = _format_date_display(date, mtime)
     date_ts = _date_ts(date, mtime)
     attachments = email.get("attachments")
     has_attachments = isinstance(attachments, list) and len(attachments) > 0
-    triage_exists = _triage_path(email_id).exists()
-    raw_status = _status_for_email(email_id)
-    st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR))
-    pstatus = processing_status(st)
+    triage_exists, raw_status, pstatus = _state_fields(email_id, statuses, triage_ids)
 
     item = EmailListItem(
         email_id=email_id,
@@ -380,45 +638,127 @@ def _parse_email_file(path: str) -> Tuple[EmailListItem, Dict[str, Any]]:
     return item, email
 
 
+# 邮件列表缓存：path -> ((st_mtime_ns, st_size), item)。
+# 邮件文件没变就不再解析 JSON；triage/state 会被频繁改写，每次仍重新读取。
+_LIST_CACHE: Dict[str, Tuple[Tuple[int, int], EmailListItem]] = {}
+
+
+def _list_item_for_file(
+    path: str,
+    statuses: Optional[Dict[str, Tuple[str, str]]] = None,
+    triage_ids: Optional[Set[str]] = None,
+    st: Optional[os.stat_result] = None,
+) -> EmailListItem:
+    key: Optional[Tuple[int, int]] = None
+    if st is None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+    if st is not None:
+        key = (st.st_mtime_ns, st.st_size)
+    cached = _LIST_CACHE.get(path)
+    if key is not None and cached is not None and cached[0] == key:
+        item = cached[1]
+        triage_exists, raw_status, pstatus = _state_fields(item.email_id, statuses, triage_ids)
+        return replace(item, triage_exists=triage_exists, status=raw_status, processing_status=pstatus)
+    item, _ = _parse_email_file(path, statuses, triage_ids, st.st_mtime if st is not None else None)
+    if key is not None:
+        _LIST_CACHE[path] = (key, item)
+    return item
+
+
+def _email_files() -> List[Tuple[str, os.stat_result]]:
+    """
+    out/emails/*.json 及其 stat，按 mtime 倒序（与 discover_input_files 一致）。
+    一次 scandir，每个文件只 stat 一次：排序和列表缓存的签名共用这份 stat。
+    """
+    found: List[Tuple[str, os.stat_result]] = []
+    try:
+        it = os.scandir(EMAILS_DIR)
+    except OSError:
+        return found
+    with it:
+        for entry in it:
+            name = entry.name
+            # 与 glob("*.json") 一致：不含隐藏文件
+            if name.startswith(".") or not name.endswith(".json"):
+                continue
+            try:
+                found.append((entry.path, entry.stat()))
+            except OSError:
+                continue
+    found.sort(key=lambda f: f[1].st_mtime, reverse=True)
+    return found
+
+
 def list_email_items(limit: Optional[int] = None) -> List[EmailListItem]:
-    if not EMAILS_DIR.exists():
+    files = _email_files()
+    if not files:
         return []
-    files = discover_input_files(str(EMAILS_DIR / "*.json"))
+    # 全量列表时一次性读出 state/triage 目录；只取前几封时逐封读更省
+    statuses: Optional[Dict[str, Tuple[str, str]]] = None
+    triage_ids: Optional[Set[str]] = None
+    if limit is None:
+        statuses = _load_all_statuses()
+        triage_ids = _triage_ids()
     items: List[EmailListItem] = []
-    for p in files:
-        item, _ = _parse_email_file(p)
-        items.append(item)
+    for p, st in files:
+        items.append(_list_item_for_file(p, statuses, triage_ids, st))
         if limit is not None and len(items) >= limit:
             break
+    if limit is None and len(_LIST_CACHE) > len(files):
+        # 全量扫描时顺便清掉已删除文件的缓存
+        for stale in _LIST_CACHE.keys() - {p for p, _ in files}:
+            _LIST_CACHE.pop(stale, None)
     # newest first by email date (fallback to mtime)
     items.sort(key=lambda e: (e.date_ts, e.mtime), reverse=True)
     return items
 
 
+# 单封邮件缓存：path -> ((st_mtime_ns, st_size), email)。详情/处理面板会反复打开同一封邮件；
+# 重新拉取会改写文件，按文件签名判断是否重读。只保留最近 EMAIL_CACHE_SIZE 封（正文可能很大）
+EMAIL_CACHE_SIZE = 64
+# 同步端点跑在 AnyIO 的工作线程上、_load_fetched_emails 走 asyncio.to_thread：读写都要持锁
+_EMAIL_CACHE: "OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+_EMAIL_CACHE_LOCK = threading.Lock()
+
+
 def load_email_by_id(email_id: str) -> Dict[str, Any]:
-    path = EMAILS_DIR / f"{email_id}.json"
-    if not path.exists():
+    """
+    返回的 dict 会被多个请求共用，只读。
+    """
+    path = str(EMAILS_DIR / f"{email_id}.json")
+    try:
+        st = os.stat(path)
+    except OSError:
         raise HTTPException(status_code=404, detail=f"Email not found: {email_id}")
+    key = (st.st_mtime_ns, st.st_size)
+    with _EMAIL_CACHE_LOCK:
+        cached = _EMAIL_CACHE.get(path)
+        if cached is not None and cached[0] == key:
+            _EMAIL_CACHE.move_to_end(path)
+            return cached[1]
     try:
-        return load_json(str(path))
+        email = load_json(path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read email json: {e}")
+    with _EMAIL_CACHE_LOCK:
+        _EMAIL_CACHE[path] = (key, email)
+        _EMAIL_CACHE.move_to_end(path)
+        while len(_EMAIL_CACHE) > EMAIL_CACHE_SIZE:
+            _EMAIL_CACHE.popitem(last=False)
+    return email
 
 
 def _labels_from_text(raw: str) -> List[str]:
-    # 支持逗号/换行分隔
-    parts: List[str] = []
-    for chunk in raw.replace("\r", "\n").split("\n"):
-        parts.extend(chunk.split(","))
-    labels = [p.strip() for p in parts if p.strip()]
-    # 去重但保持顺序
-    out: List[str] = []
-    seen = set()
-    for l in labels:
-        if l not in seen:
-            out.append(l)
-            seen.add(l)
-    return out
+    # 表单里 labels 经常留空：直接返回，不走 replace/split
+    if not raw or raw.isspace():
+        return []
+    # 支持逗号/换行分隔：换行统一换成逗号后一次 split
+    labels = [p.strip() for p in raw.replace("\r", ",").replace("\n", ",").split(",")]
+    # 去重但保持顺序（dict 保序），顺带丢掉空项
+    return [l for l in dict.fromkeys(labels) if l]
 
 
 # ----------------------------
@@ -474,7 +814,8 @@ def auth_gmail_callback(request: Request, code: str | None = None, state: str |
             {"request": request, "token_exists": token_exists(), "error": "OAuth 回调缺少 code。"},
         )
     expected = request.session.get("oauth_state")
-    if expected and state and state != expected:
+    # 常量时间比较 OAuth state
+    if expected and state and not hmac.compare_digest(state.encode("utf-8"), str(expected).encode("utf-8")):
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "token_exists": token_exists(), "error": "OAuth state 不匹配，请重试登录。"},
@@ -512,23 +853,28 @@ def _home_counts(emails: List[EmailListItem]) -> Dict[str, int]:
     for e in emails:
         if e.status in counts:
             counts[e.status] += 1
-    # candidate 需要 triage 才能判断：只统计 todo 中已 triage 且候选
-    cand = 0
-    for e in emails:
-        if e.status != "todo":
-            continue
-        triage = load_triage_for_id(e.email_id, triage_dir=str(TRIAGE_DIR))
-        if _is_candidate(triage):
-            cand += 1
-    counts["candidate"] = cand
+        # candidate 需要 triage 才能判断：只统计 todo 中已 triage 且候选
+        if e.status == "todo" and e.triage_exists and _triage_is_candidate(e.email_id):
+            counts["candidate"] += 1
     return counts
 
 
 @app.get("/email/{email_id}", response_class=HTMLResponse, name="email_detail")
 def email_detail(request: Request, email_id: str) -> HTMLResponse:
     _require_gmail_login(request)
+    # 原文页只依赖邮件文件本身：文件签名没变就 304，连 JSON 都不用读
+    try:
+        st = os.stat(EMAILS_DIR / f"{email_id}.json")
+    except OSError:
+        st = None
+    etag = ""
+    if st is not None:
+        etag = _etag(_EMAIL_VIEW_TEMPLATES, "email", email_id, st.st_mtime_ns, st.st_size)
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
     email = load_email_by_id(email_id)
-    return templates.TemplateResponse(
+    resp = templates.TemplateResponse(
         "email_view.html",
         {
             "request": request,
@@ -536,6 +882,7 @@ def email_detail(request: Request, email_id: str) -> HTMLResponse:
             "email": email,
         },
     )
+    return _with_etag(resp, etag) if etag else resp
 
 
 @app.get("/email/{email_id}/triage", response_class=HTMLResponse, name="email_triage")
@@ -552,6 +899,16 @@ def email_triage(request: Request, email_id: str) -> HTMLResponse:
         {"request": request, "email_id": email_id, "email": email, "triage": triage, "status": status},
     )
 
+def _parse_filter_ts(raw: str) -> Optional[float]:
+    # 换算成时间戳后，逐封邮件只需比较 float，不再为每封邮件构造 datetime
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw).timestamp()
+    except Exception:
+        return None
+
+
 @app.get("/emails", response_class=HTMLResponse, name="emails_page")
 def emails_page(
     request: Request,
@@ -572,6 +929,9 @@ def emails_page(
 
     # filters
     q_norm = (q or "").strip().lower()
+    # 时间筛选参数（datetime-local: "YYYY-MM-DDTHH:MM"）只解析一次；解析失败则不按该条件筛选
+    ts_from = _parse_filter_ts(date_from)
+    ts_to = _parse_filter_ts(date_to)
     filtered: List[EmailListItem] = []
     for e in emails:
         if status == "active":
@@ -584,25 +944,13 @@ def emails_page(
             if q_norm not in hay:
                 continue
         # 时间筛选：尽量按邮件 Date；失败 fallback 到 mtime
-        if date_from:
-            try:
-                # 支持 datetime-local: "YYYY-MM-DDTHH:MM"
-                df = datetime.fromisoformat(date_from)
-                if datetime.fromtimestamp(e.date_ts) < df:
-                    continue
-            except Exception:
-                pass
-        if date_to:
-            try:
-                dt = datetime.fromisoformat(date_to)
-                if datetime.fromtimestamp(e.date_ts) > dt:
-                    continue
-            except Exception:
-                pass
+        if ts_from is not None and e.date_ts < ts_from:
+            continue
+        if ts_to is not None and e.date_ts > ts_to:
+            continue
         filtered.append(e)
 
-    # newest first by email date_ts
-    filtered.sort(key=lambda x: (x.date_ts, x.mtime), reverse=True)
+    # list_email_items 已按 (date_ts, mtime) 倒序排好，筛选不改变顺序，无需再排
 
     total = len(filtered)
     start = (page - 1) * page_size
@@ -610,20 +958,34 @@ def emails_page(
     page_items = filtered[start:end]
     total_pages = max(1, (total + page_size - 1) // page_size)
 
-    return templates.TemplateResponse(
-        "emails.html",
-        {
-            "request": request,
-            "emails": page_items,
-            "q": q,
-            "status": status,
-            "date_from": date_from,
-            "date_to": date_to,
-            "page": page,
-            "total": total,
-            "total_pages": total_pages,
-            "page_size": page_size,
-        },
+    # 列表页只展示这些字段：内容没变就 304
+    etag = _etag(
+        _EMAILS_PAGE_TEMPLATES, "emails", q, status, date_from, date_to, page, page_size, total,
+        [
+            (e.email_id, e.subject, e.from_email, e.from_name, e.date, e.date_display, e.date_ts, e.processing_status)
+            for e in page_items
+        ],
+    )
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+    return _with_etag(
+        templates.TemplateResponse(
+            "emails.html",
+            {
+                "request": request,
+                "emails": page_items,
+                "q": q,
+                "status": status,
+                "date_from": date_from,
+                "date_to": date_to,
+                "page": page,
+                "total": total,
+                "total_pages": total_pages,
+                "page_size": page_size,
+            },
+        ),
+        etag,
     )
 
 
@@ -636,7 +998,7 @@ async def api_email_process(request: Request, email_id: str) -> HTMLResponse:
     if READ_ONLY:
         raise HTTPException(status_code=403, detail="只读模式下不允许写入状态。")
     await asyncio.to_thread(mark_processed, email_id, state_dir=str(TRIAGE_STATE_DIR))
-    return HTMLResponse(content="", status_code=204)
+    return Response(status_code=204)
 
 
 def _normalize_processing_status(x: str) -> str:
@@ -660,11 +1022,8 @@ def _emails_url(q: str, status: str, date_from: str, date_to: str, page: int) ->
 
 
 def _bulk_set_status(email_ids: List[str], new_status: str) -> None:
-    for eid in email_ids:
-        eid2 = (eid or "").strip()
-        if not eid2:
-            continue
-        set_status(eid2, new_status, state_dir=str(TRIAGE_STATE_DIR))
+    ids = [eid2 for eid2 in ((eid or "").strip() for eid in email_ids) if eid2]
+    set_status_many(ids, new_status, state_dir=str(TRIAGE_STATE_DIR))
 
 
 @app.post("/api/emails/bulk_set_status", response_class=HTMLResponse, name="api_emails_bulk_set_status")
@@ -697,8 +1056,9 @@ def process_email(request: Request, email_id: str) -> HTMLResponse:
     st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)) or {}
     pstatus = processing_status(st)
     issue_types = _jira_issue_type_options()
-    jira_defaults = _jira_draft_from_state(st) or _jira_defaults_for_email(email, st, issue_types)
-    jira_generated = _jira_draft_from_state(st) is not None
+    draft = _jira_draft_from_state(st)
+    jira_defaults = draft or _jira_defaults_for_email(email, st, issue_types)
+    jira_generated = draft is not None
     return templates.TemplateResponse(
         "process_email.html",
         {
@@ -719,7 +1079,7 @@ def process_email(request: Request, email_id: str) -> HTMLResponse:
 @app.get("/partials/fetch_modal", response_class=HTMLResponse, name="partial_fetch_modal")
 def partial_fetch_modal(request: Request) -> HTMLResponse:
     _require_gmail_login(request)
-    settings = load_settings(path=str(OUT_DIR / "settings.json"))
+    settings = load_settings(path=SETTINGS_PATH)
     gmail = settings.get("gmail") if isinstance(settings.get("gmail"), dict) else {}
     label = str(gmail.get("label") or "").strip()
     return templates.TemplateResponse("partials/fetch_modal.html", {"request": request, "label": label})
@@ -775,7 +1135,7 @@ def work_page(request: Request, scope: str = "candidate") -> HTMLResponse:
 @app.get("/settings", response_class=HTMLResponse, name="settings_page")
 def settings_page(request: Request) -> HTMLResponse:
     _require_gmail_login(request)
-    settings = load_settings(path=str(OUT_DIR / "settings.json"))
+    settings = load_settings(path=SETTINGS_PATH)
     gmail = settings.get("gmail") if isinstance(settings.get("gmail"), dict) else {}
     jira = settings.get("jira") if isinstance(settings.get("jira"), dict) else {}
     ai = settings.get("ai") if isinstance(settings.get("ai"), dict) else {}
@@ -790,7 +1150,7 @@ def settings_page(request: Request) -> HTMLResponse:
             "prompt": prompt,
             "saved": None,
             "error": None,
-            "settings_path": str(OUT_DIR / "settings.json"),
+            "settings_path": SETTINGS_PATH,
             "read_only": READ_ONLY,
         },
     )
@@ -810,12 +1170,17 @@ async def api_settings_save(
     ai_base_url: str = Form(""),
     ai_api_key: str = Form(""),
     ai_model: str = Form(""),
+    ai_concurrency: str = Form(""),
+    ai_max_requests_per_minute: str = Form(""),
+    ai_stream: bool = Form(False),
+    ai_max_body_chars: str = Form(""),
+    ai_json_mode: str = Form("auto"),
     prompt: str = Form(""),
 ) -> HTMLResponse:
     _require_gmail_login(request)
     is_hx = request.headers.get("HX-Request") == "true"
     if READ_ONLY:
-        settings = load_settings(path=str(OUT_DIR / "settings.json"))
+        settings = load_settings(path=SETTINGS_PATH)
         gmail = settings.get("gmail") if isinstance(settings.get("gmail"), dict) else {}
         jira = settings.get("jira") if isinstance(settings.get("jira"), dict) else {}
         ai = settings.get("ai") if isinstance(settings.get("ai"), dict) else {}
@@ -831,13 +1196,15 @@ async def api_settings_save(
                 "prompt": prompt_cur,
                 "saved": None,
                 "error": "当前处于只读模式（例如 Vercel Serverless）。请在 Vercel 项目里配置环境变量，或在本地运行以保存到 out/settings.json。",
-                "settings_path": str(OUT_DIR / "settings.json"),
+                "settings_path": SETTINGS_PATH,
                 "read_only": READ_ONLY,
             },
         )
 
     try:
-        merge_settings(
+        # merge_settings 会 fsync：放到线程里，不卡住事件循环；返回值就是刚写入的设置
+        settings = await asyncio.to_thread(
+            merge_settings,
             {
                 "gmail": {"label": gmail_label.strip()},
                 "jira": {
@@ -853,13 +1220,18 @@ async def api_settings_save(
                     "base_url": ai_base_url.strip(),
                     "api_key": ai_api_key.strip(),
                     "model": ai_model.strip(),
+                    "concurrency": ai_concurrency.strip(),
+                    "max_requests_per_minute": ai_max_requests_per_minute.strip(),
+                    "stream": ai_stream,
+                    "max_body_chars": ai_max_body_chars.strip(),
+                    "json_mode": ai_json_mode.strip() or "auto",
                 },
                 "prompt": prompt,
             },
-            path=str(OUT_DIR / "settings.json"),
+            path=SETTINGS_PATH,
         )
     except Exception as e:
-        settings = load_settings(path=str(OUT_DIR / "settings.json"))
+        settings = load_settings(path=SETTINGS_PATH)
         gmail = settings.get("gmail") if isinstance(settings.get("gmail"), dict) else {}
         jira = settings.get("jira") if isinstance(settings.get("jira"), dict) else {}
         ai = settings.get("ai") if isinstance(settings.get("ai"), dict) else {}
@@ -875,12 +1247,11 @@ async def api_settings_save(
                 "prompt": prompt_cur,
                 "saved": None,
                 "error": str(e),
-                "settings_path": str(OUT_DIR / "settings.json"),
+                "settings_path": SETTINGS_PATH,
                 "read_only": READ_ONLY,
             },
         )
 
-    settings = load_settings(path=str(OUT_DIR / "settings.json"))
     gmail = settings.get("gmail") if isinstance(settings.get("gmail"), dict) else {}
     jira = settings.get("jira") if isinstance(settings.get("jira"), dict) else {}
     ai = settings.get("ai") if isinstance(settings.get("ai"), dict) else {}
@@ -896,39 +1267,111 @@ async def api_settings_save(
             "prompt": prompt_cur,
             "saved": "已保存",
             "error": None,
-            "settings_path": str(OUT_DIR / "settings.json"),
+            "settings_path": SETTINGS_PATH,
             "read_only": READ_ONLY,
         },
     )
 
 
-def _pick_next_email_id(scope: str) -> Optional[str]:
+# 候选判定缓存：triage path -> ((st_mtime_ns, st_size), 是否候选)。
+# 工作队列每次决策后都要从头找下一封候选，triage 文件没变就不再重读/解析
+_CANDIDATE_CACHE: Dict[str, Tuple[Tuple[int, int], bool]] = {}
+
+
+def _triage_is_candidate(email_id: str) -> bool:
+    path = os.path.join(str(TRIAGE_DIR), f"{email_id}{_TRIAGE_SUFFIX}")
+    try:
+        st = os.stat(path)
+    except OSError:
+        _CANDIDATE_CACHE.pop(path, None)
+        return False
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _CANDIDATE_CACHE.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    verdict = _is_candidate(load_triage_for_id(email_id, triage_dir=str(TRIAGE_DIR)))
+    _CANDIDATE_CACHE[path] = (key, verdict)
+    return verdict
+
+
+def _pick_next_email_id(scope: str, exclude: Optional[str] = None) -> Optional[str]:
     emails = list_email_items()
     for e in emails:
-        if e.status != "todo":
+        if e.status != "todo" or e.email_id == exclude:
             continue
         if scope == "todo":
             return e.email_id
-        # candidate
-        triage = load_triage_for_id(e.email_id, triage_dir=str(TRIAGE_DIR))
-        if not triage:
-            # 没 triage 的先不判定候选（会在 work 页面自动 triage）
-            continue
-        if _is_candidate(triage):
+        # candidate；没 triage 的先不判定候选（会在 work 页面自动 triage）
+        if e.triage_exists and _triage_is_candidate(e.email_id):
             return e.email_id
     # candidate 队列为空时，fallback 到 todo
     if scope == "candidate":
         for e in emails:
-            if e.status == "todo":
+            if e.status == "todo" and e.email_id != exclude:
                 return e.email_id
     return None
 
 
+def _next_untriaged_email_id(scope: str, current_id: str) -> Optional[str]:
+    # 当前这封提交后就不再是 todo：先排除它预判下一封，还没 triage 的才需要预取
+    next_id = _pick_next_email_id(scope, exclude=current_id)
+    if next_id and not os.path.exists(os.path.join(str(TRIAGE_DIR), f"{next_id}{_TRIAGE_SUFFIX}")):
+        return next_id
+    return None
+
+
 # ----------------------------
 # HTMX APIs
 # ----------------------------
 
 
+# email_id -> 正在跑的 triage：同一封邮件同时被多处触发（Run、批量、工作队列）时共用一次结果
+_INFLIGHT_TRIAGE: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+def _start_triage(email_id: str) -> "asyncio.Future[Dict[str, Any]]":
+    fut = _INFLIGHT_TRIAGE.get(email_id)
+    if fut is None:
+        fut = asyncio.ensure_future(asyncio.to_thread(triage_email_id, email_id, str(EMAILS_DIR), str(TRIAGE_DIR)))
+        _INFLIGHT_TRIAGE[email_id] = fut
+
+        def _forget(done: "asyncio.Future[Dict[str, Any]]") -> None:
+            if _INFLIGHT_TRIAGE.get(email_id) is done:
+                del _INFLIGHT_TRIAGE[email_id]
+
+        fut.add_done_callback(_forget)
+    return fut
+
+
+def _retrieve_exception(fut: "asyncio.Future[Any]") -> None:
+    # 后台任务没人等结果时也要取走异常，避免 "exception was never retrieved"；预取失败了下次展示时会重跑
+    if not fut.cancelled():
+        fut.exception()
+
+
+# 正在跑的预取任务：事件循环只持有弱引用，这里留一份强引用，跑完自动移除
+_PREFETCH_TASKS: Set["asyncio.Task[None]"] = set()
+
+
+async def _prefetch_next_triage(scope: str, current_id: str) -> None:
+    next_id = await asyncio.to_thread(_next_untriaged_email_id, scope, current_id)
+    if next_id:
+        _start_triage(next_id).add_done_callback(_retrieve_exception)
+
+
+def _start_prefetch_next_triage(scope: str, current_id: str) -> None:
+    task = asyncio.create_task(_prefetch_next_triage(scope, current_id))
+    _PREFETCH_TASKS.add(task)
+    task.add_done_callback(_PREFETCH_TASKS.discard)
+    task.add_done_callback(_retrieve_exception)
+
+
+async def _triage_email(email_id: str) -> Dict[str, Any]:
+    fut = _start_triage(email_id)
+    # shield：某个请求被取消时不连带取消其他请求在等的同一次 triage
+    return await asyncio.shield(fut)
+
+
 @app.post("/api/triage/run/{email_id}", response_class=HTMLResponse, name="api_triage_run")
 async def api_triage_run(request: Request, email_id: str) -> HTMLResponse:
     _require_gmail_login(request)
@@ -939,7 +1382,7 @@ async def api_triage_run(request: Request, email_id: str) -> HTMLResponse:
         )
     # 用线程避免阻塞 event loop（未来 triage 如果变重也更稳）
     try:
-        triage = await asyncio.to_thread(triage_email_id, email_id, str(EMAILS_DIR), str(TRIAGE_DIR))
+        triage = await _triage_email(email_id)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Email not found: {email_id}")
     except Exception as e:
@@ -1030,15 +1473,12 @@ async def api_process_mark(
         raise HTTPException(status_code=403, detail="只读模式下不允许写入状态。")
     if mark not in {"processed", "ignore"}:
         mark = "processed"
-    await asyncio.to_thread(set_status, email_id, mark, state_dir=str(TRIAGE_STATE_DIR))
-    email = load_email_by_id(email_id)
-    st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)) or {}
-    pstatus = processing_status(st)
-    issue_types = _jira_issue_type_options()
-    jira_defaults = _jira_draft_from_state(st) or _jira_defaults_for_email(email, st, issue_types)
-    jira_generated = _jira_draft_from_state(st) is not None
+    # set_status 返回的就是刚写入的 state，不必再读一次盘
+    st = await asyncio.to_thread(set_status, email_id, mark, state_dir=str(TRIAGE_STATE_DIR))
     if request.headers.get("HX-Request") != "true":
         return RedirectResponse(url=f"/process/{email_id}", status_code=302)
+    email = load_email_by_id(email_id)
+    # 标记后只会是已处理/无需处理：面板不渲染 Jira 表单，不需要下拉选项和默认值
     return templates.TemplateResponse(
         "partials/process_panel.html",
         {
@@ -1046,11 +1486,11 @@ async def api_process_mark(
             "email_id": email_id,
             "email": email,
             "state": st,
-            "processing_status": pstatus,
+            "processing_status": processing_status(st),
             "read_only": READ_ONLY,
-            "jira_issue_types": issue_types,
-            "jira_defaults": jira_defaults,
-            "jira_generated": jira_generated,
+            "jira_issue_types": [],
+            "jira_defaults": {},
+            "jira_generated": False,
             "error": None,
         },
     )
@@ -1073,10 +1513,8 @@ async def api_process_jira(
     st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)) or {}
     pstatus = processing_status(st)
     issue_types = _jira_issue_type_options()
-    jira_defaults = _jira_defaults_for_email(email, st, issue_types)
-    jira_generated = _jira_draft_from_state(st) is not None
 
-    # 仅允许对待处理推进 Jira（避免重复/误点）
+    # 仅允许对待处理推进 Jira（避免重复/误点）；非 pending 的面板不渲染 Jira 表单，不需要默认值
     if pstatus != "pending":
         if request.headers.get("HX-Request") != "true":
             return RedirectResponse(url=f"/process/{email_id}", status_code=302)
@@ -1090,22 +1528,14 @@ async def api_process_jira(
                 "processing_status": pstatus,
                 "read_only": READ_ONLY,
                 "jira_issue_types": issue_types,
-                "jira_defaults": jira_defaults,
-                "jira_generated": jira_generated,
+                "jira_defaults": {},
+                "jira_generated": False,
                 "error": "当前状态不是“待处理”，不允许创建 Jira。",
             },
         )
 
     try:
-        settings = load_settings(path=str(OUT_DIR / "settings.json"))
-        cfg = None
-        if isinstance(settings.get("jira"), dict):
-            try:
-                cfg = jira_config_from_dict(settings["jira"])
-            except JiraError:
-                cfg = None
-        if cfg is None:
-            cfg = load_jira_config_from_env()
+        cfg = _jira_config()
 
         labels_list = _labels_from_text(labels)
         issue_type = (issue_type_name or "").strip() or issue_types[0]
@@ -1121,15 +1551,15 @@ async def api_process_jira(
         if not issue_key:
             raise JiraError(f"Jira response missing key: {created}")
         jira_url = issue_browse_url(cfg, issue_key)
-        await asyncio.to_thread(set_jira_link, email_id, jira_key=issue_key, jira_url=jira_url, state_dir=str(TRIAGE_STATE_DIR))
-        st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)) or st
+        # set_jira_link 返回的就是刚写入的 state
+        st = await asyncio.to_thread(set_jira_link, email_id, jira_key=issue_key, jira_url=jira_url, state_dir=str(TRIAGE_STATE_DIR))
         pstatus = processing_status(st)
     except Exception as e:
         if request.headers.get("HX-Request") != "true":
             return RedirectResponse(url=f"/process/{email_id}", status_code=302)
         # 保持用户输入（用本次提交覆盖 defaults）
         jira_defaults = {
-            "issue_type_name": (issue_type_name or jira_defaults.get("issue_type_name") or "").strip(),
+            "issue_type_name": (issue_type_name or _default_issue_type(issue_types)).strip(),
             "summary": summary or "",
             "description": description or "",
             "labels": labels or "",
@@ -1145,16 +1575,14 @@ async def api_process_jira(
                 "read_only": READ_ONLY,
                 "jira_issue_types": issue_types,
                 "jira_defaults": jira_defaults,
-                "jira_generated": jira_generated,
+                "jira_generated": _jira_draft_from_state(st) is not None,
                 "error": f"创建 Jira 失败：{e}（请先在 /settings 配置 Jira）",
             },
         )
 
     if request.headers.get("HX-Request") != "true":
         return RedirectResponse(url=f"/process/{email_id}", status_code=302)
-    # 成功：刷新右侧面板，展示 Jira 链接 + 已处理状态
-    jira_defaults = _jira_draft_from_state(st) or _jira_defaults_for_email(email, st, issue_types)
-    jira_generated = _jira_draft_from_state(st) is not None
+    # 成功：刷新右侧面板，展示 Jira 链接 + 已处理状态（已有 Jira 链接，表单不再渲染）
     return templates.TemplateResponse(
         "partials/process_panel.html",
         {
@@ -1165,8 +1593,8 @@ async def api_process_jira(
             "processing_status": pstatus,
             "read_only": READ_ONLY,
             "jira_issue_types": issue_types,
-            "jira_defaults": jira_defaults,
-            "jira_generated": jira_generated,
+            "jira_defaults": {},
+            "jira_generated": False,
             "error": None,
         },
     )
@@ -1193,10 +1621,13 @@ async def api_process_jira_generate(
 
     warn: Optional[str] = None
     try:
-        settings = load_settings(path=str(OUT_DIR / "settings.json"))
+        settings = load_settings(path=SETTINGS_PATH)
         ai_ctx = st.get("ai") if isinstance(st.get("ai"), dict) else None
         cfg = _ai_cfg_for_jira(settings)
-        draft = generate_jira_draft_openai_compatible(cfg, email=email, issue_type_name=issue_type_name, ai_context=ai_ctx)
+        # AI 请求要好几秒：放到线程里，别的请求（包括状态轮询）不用干等
+        draft = await asyncio.to_thread(
+            generate_jira_draft_openai_compatible, cfg, email=email, issue_type_name=issue_type_name, ai_context=ai_ctx
+        )
         labels_list = draft.get("labels") if isinstance(draft.get("labels"), list) else []
     except Exception as e:
         # AI 失败时：fallback 用模板生成，保证流程可走通
@@ -1223,7 +1654,7 @@ async def api_process_jira_generate(
         labels_list = []
         warn = f"AI 生成失败，已使用模板生成（可手动修改）：{e}"
 
-    await asyncio.to_thread(
+    st = await asyncio.to_thread(
         upsert_jira_draft,
         email_id,
         issue_type_name=issue_type_name,
@@ -1232,10 +1663,10 @@ async def api_process_jira_generate(
         labels=labels_list,
         state_dir=str(TRIAGE_STATE_DIR),
     )
-    st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)) or st
 
-    jira_defaults = _jira_draft_from_state(st) or _jira_defaults_for_email(email, st, issue_types)
-    jira_generated = _jira_draft_from_state(st) is not None
+    saved = _jira_draft_from_state(st)
+    jira_defaults = saved or _jira_defaults_for_email(email, st, issue_types)
+    jira_generated = saved is not None
     return templates.TemplateResponse(
         "partials/process_panel.html",
         {
@@ -1266,15 +1697,16 @@ async def api_process_reply_generate(request: Request, email_id: str) -> HTMLRes
     st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)) or {}
     pstatus = processing_status(st)
     issue_types = _jira_issue_type_options()
-    jira_defaults = _jira_draft_from_state(st) or _jira_defaults_for_email(email, st, issue_types)
-    jira_generated = _jira_draft_from_state(st) is not None
+    draft = _jira_draft_from_state(st)
+    jira_defaults = draft or _jira_defaults_for_email(email, st, issue_types)
+    jira_generated = draft is not None
 
     warn: Optional[str] = None
     try:
-        settings = load_settings(path=str(OUT_DIR / "settings.json"))
+        settings = load_settings(path=SETTINGS_PATH)
         cfg = _ai_cfg_for_reply(settings)
-        out = generate_reply_openai_compatible(cfg, email=email)
-        await asyncio.to_thread(
+        out = await asyncio.to_thread(generate_reply_openai_compatible, cfg, email=email)
+        st = await asyncio.to_thread(
             upsert_reply_draft,
             email_id,
             language=str(out.get("language") or "unknown"),
@@ -1282,7 +1714,6 @@ async def api_process_reply_generate(request: Request, email_id: str) -> HTMLRes
             reply_zh=str(out.get("reply_zh") or ""),
             state_dir=str(TRIAGE_STATE_DIR),
         )
-        st = load_state(email_id, state_dir=str(TRIAGE_STATE_DIR)) or st
     except Exception as e:
         warn = f"生成回信失败：{e}"
 
@@ -1303,6 +1734,21 @@ async def api_process_reply_generate(request: Request, email_id: str) -> HTMLRes
     )
 
 
+# 每个任务表最多保留多少个已结束的任务（供状态轮询）；进行中的任务不受影响
+JOB_HISTORY_LIMIT = 100
+
+
+def _remember_job(jobs: Dict[str, Any], job_id: str, job: Any) -> None:
+    """
+    登记新任务，并按登记顺序丢掉超出 JOB_HISTORY_LIMIT 的最早的已结束任务，
+    避免长期运行的服务里任务表无限增长。
+    """
+    jobs[job_id] = job
+    finished = [k for k, j in jobs.items() if j.finished]
+    for k in finished[: max(0, len(finished) - JOB_HISTORY_LIMIT)]:
+        del jobs[k]
+
+
 class FetchParseJob:
     def __init__(self, job_id: str, limit: int, include_from_me: bool):
         self.job_id = job_id
@@ -1321,9 +1767,28 @@ class FetchParseJob:
 FETCH_PARSE_JOBS: Dict[str, FetchParseJob] = {}
 
 
+def _load_fetched_emails(email_ids: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    读出本次拉到的邮件；读不出来的直接记一条 AI 失败结果。整批在同一个线程里完成。
+    """
+    loaded: List[Tuple[str, Dict[str, Any]]] = []
+    for mid in email_ids:
+        try:
+            loaded.append((mid, load_email_by_id(mid)))
+        except Exception as e:
+            upsert_ai_result(mid, decision="pending", reason=f"AI 解析失败：{e}", raw={"error": str(e)}, state_dir=str(TRIAGE_STATE_DIR))
+    return loaded
+
+
+def _save_ai_results(results: List[Tuple[str, str, str, Dict[str, Any]]]) -> None:
+    # 每封邮件各有一个 state 文件，写入没法再合并；只是把整批放进一次线程切换里
+    for mid, decision, reason, raw in results:
+        upsert_ai_result(mid, decision=decision, reason=reason, raw=raw, state_dir=str(TRIAGE_STATE_DIR))
+
+
 async def _run_fetch_parse(job: FetchParseJob, label: str) -> None:
     try:
-        settings = load_settings(path=str(OUT_DIR / "settings.json"))
+        settings = load_settings(path=SETTINGS_PATH)
         cfg = ai_config_from_settings(settings)
 
         fetched_ids: List[str] = []
@@ -1343,22 +1808,25 @@ async def _run_fetch_parse(job: FetchParseJob, label: str) -> None:
             progress_cb=on_progress,
         )
 
-        # 解析：对本次拉到的 msg_id 逐个调用 AI
-        for mid in fetched_ids:
-            try:
-                email = load_email_by_id(mid)
-                out = analyze_email(cfg, email)
-                result = str(out.get("result") or "").strip()
-                decision = "ignore" if result == "无需处理" else "pending"
-                reason = str(out.get("reason") or "")
-                upsert_ai_result(mid, decision=decision, reason=reason, raw=out, state_dir=str(TRIAGE_STATE_DIR))
-            except Exception as e:
-                upsert_ai_result(mid, decision="pending", reason=f"AI 解析失败：{e}", raw={"error": str(e)}, state_dir=str(TRIAGE_STATE_DIR))
+        # 解析：本次拉到的 msg_id 先读盘，再按批合并调用 AI（减少请求次数）
+        loaded = await asyncio.to_thread(_load_fetched_emails, fetched_ids)
+
+        outs = await asyncio.to_thread(analyze_emails_batch, cfg, [email for _, email in loaded])
+        results: List[Tuple[str, str, str, Dict[str, Any]]] = []
+        for (mid, _), out in zip(loaded, outs):
+            if out.get("error"):
+                results.append((mid, "pending", f"AI 解析失败：{out['error']}", out))
+                continue
+            result = str(out.get("result") or "").strip()
+            decision = "ignore" if result == "无需处理" else "pending"
+            reason = str(out.get("reason") or "")
+            results.append((mid, decision, reason, out))
+        await asyncio.to_thread(_save_ai_results, results)
 
     except Exception as e:
         job.error = str(e)
     finally:
-        job.finished_at = datetime.utcnow().isoformat() + "Z"
+        job.finished_at = _utc_now()
 
 
 @app.post("/api/fetch_parse/start", response_class=HTMLResponse, name="api_fetch_parse_start")
@@ -1372,23 +1840,25 @@ async def api_fetch_parse_start(
     if READ_ONLY:
         raise HTTPException(status_code=403, detail="只读模式下不允许拉取/解析。")
     limit = max(1, min(int(limit or 50), 500))
-    settings = load_settings(path=str(OUT_DIR / "settings.json"))
+    settings = load_settings(path=SETTINGS_PATH)
     gmail = settings.get("gmail") if isinstance(settings.get("gmail"), dict) else {}
     label = (label or "").strip() or str(gmail.get("label") or "").strip()
 
     job_id = uuid.uuid4().hex
     job = FetchParseJob(job_id=job_id, limit=limit, include_from_me=include_from_me)
-    FETCH_PARSE_JOBS[job_id] = job
+    _remember_job(FETCH_PARSE_JOBS, job_id, job)
     asyncio.create_task(_run_fetch_parse(job, label))
     return templates.TemplateResponse("partials/fetch_parse_status.html", {"request": request, "job": job})
 
 
 @app.get("/api/fetch_parse/status/{job_id}", response_class=HTMLResponse, name="api_fetch_parse_status")
-def api_fetch_parse_status(request: Request, job_id: str) -> HTMLResponse:
+def api_fetch_parse_status(request: Request, job_id: str, v: str = "") -> HTMLResponse:
     _require_gmail_login(request)
     job = FETCH_PARSE_JOBS.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="job not found")
+    if v and v == _job_version(job):
+        return Response(status_code=204)
     return templates.TemplateResponse("partials/fetch_parse_status.html", {"request": request, "job": job})
 
 
@@ -1429,16 +1899,10 @@ async def api_work_decide(
 
     if decision == "jira":
         try:
-            # 优先从设置读取；没有再 fallback 环境变量
-            settings = load_settings(path=str(OUT_DIR / "settings.json"))
-            cfg = None
-            if isinstance(settings.get("jira"), dict):
-                try:
-                    cfg = jira_config_from_dict(settings["jira"])
-                except JiraError:
-                    cfg = None
-            if cfg is None:
-                cfg = load_jira_config_from_env()
+            cfg = _jira_config()
+
+            # 下一封和当前这封的建单互不依赖：挑下一封 + triage 都放到后台，和建单并行；步骤 3 直接复用同一次结果
+            _start_prefetch_next_triage(scope, email_id)
 
             issue_type_name = issue_type_for_classification(cfg, classification.strip())
             created = await asyncio.to_thread(
@@ -1474,7 +1938,8 @@ async def api_work_decide(
         await asyncio.to_thread(set_status, email_id, decision, state_dir=str(TRIAGE_STATE_DIR))
 
     # 3) 返回下一封（局部刷新整个 work item）
-    next_id = _pick_next_email_id(scope=scope)
+    # 扫描全部邮件找下一封：放到线程里，别占住事件循环
+    next_id = await asyncio.to_thread(_pick_next_email_id, scope=scope)
     if not next_id:
         return templates.TemplateResponse(
             "partials/work_item.html",
@@ -1484,7 +1949,7 @@ async def api_work_decide(
     email = load_email_by_id(next_id)
     triage = load_triage_for_id(next_id, triage_dir=str(TRIAGE_DIR))
     if not triage:
-        triage = await asyncio.to_thread(triage_email_id, next_id, str(EMAILS_DIR), str(TRIAGE_DIR))
+        triage = await _triage_email(next_id)
 
     return templates.TemplateResponse(
         "partials/work_item.html",
@@ -1503,7 +1968,7 @@ class BatchJob:
         self.email_ids = email_ids
         self.total = len(email_ids)
         self.done = 0
-        self.started_at = datetime.utcnow().isoformat() + "Z"
+        self.started_at = _utc_now()
         self.finished_at: Optional[str] = None
         self.results: List[Dict[str, Any]] = []
 
@@ -1518,12 +1983,13 @@ JOBS: Dict[str, BatchJob] = {}
 async def _run_batch(job: BatchJob) -> None:
     for email_id in job.email_ids:
         try:
-            triage = await asyncio.to_thread(triage_email_id, email_id, str(EMAILS_DIR), str(TRIAGE_DIR))
-            job.results.append({"email_id": email_id, "ok": True, "error": None, "triage": triage})
+            # 状态页只展示 email_id/ok/error，不保留整份 triage，避免任务表常驻大对象
+            await _triage_email(email_id)
+            job.results.append({"email_id": email_id, "ok": True, "error": None})
         except Exception as e:
-            job.results.append({"email_id": email_id, "ok": False, "error": str(e), "triage": None})
+            job.results.append({"email_id": email_id, "ok": False, "error": str(e)})
         job.done += 1
-    job.finished_at = datetime.utcnow().isoformat() + "Z"
+    job.finished_at = _utc_now()
 
 
 @app.post("/api/triage/batch/start", response_class=HTMLResponse, name="api_batch_start")
@@ -1531,12 +1997,12 @@ async def api_batch_start(request: Request, limit: int = Form(5)) -> HTMLRespons
     limit = int(limit) if limit else 5
     limit = max(1, min(limit, 200))
 
-    email_items = list_email_items(limit=limit)
+    email_items = await asyncio.to_thread(list_email_items, limit=limit)
     email_ids = [e.email_id for e in email_items]
 
     job_id = uuid.uuid4().hex
     job = BatchJob(job_id=job_id, email_ids=email_ids)
-    JOBS[job_id] = job
+    _remember_job(JOBS, job_id, job)
 
     asyncio.create_task(_run_batch(job))
 
@@ -1547,10 +2013,12 @@ async def api_batch_start(request: Request, limit: int = Form(5)) -> HTMLRespons
 
 
 @app.get("/api/triage/batch/status/{job_id}", response_class=HTMLResponse, name="api_batch_status")
-def api_batch_status(request: Request, job_id: str) -> HTMLResponse:
+def api_batch_status(request: Request, job_id: str, v: str = "") -> HTMLResponse:
     job = JOBS.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="job not found")
+    if v and v == _job_version(job):
+        return Response(status_code=204)
     return templates.TemplateResponse("partials/batch_status.html", {"request": request, "job": job})
 
 
@@ -1567,7 +2035,7 @@ class FetchJob:
         self.include_from_me = include_from_me
         self.total = 0
         self.done = 0
-        self.started_at = datetime.utcnow().isoformat() + "Z"
+        self.started_at = _utc_now()
         self.finished_at: Optional[str] = None
         self.error: Optional[str] = None
 
@@ -1596,7 +2064,7 @@ async def _run_fetch(job: FetchJob) -> None:
     except Exception as e:
         job.error = str(e)
     finally:
-        job.finished_at = datetime.utcnow().isoformat() + "Z"
+        job.finished_at = _utc_now()
 
 
 @app.post("/api/gmail/fetch/start", response_class=HTMLResponse, name="api_gmail_fetch_start")
@@ -1617,7 +2085,7 @@ async def api_gmail_fetch_start(
 
     job_id = uuid.uuid4().hex
     job = FetchJob(job_id=job_id, label=label, max_results=mr, include_from_me=include_from_me)
-    FETCH_JOBS[job_id] = job
+    _remember_job(FETCH_JOBS, job_id, job)
 
     asyncio.create_task(_run_fetch(job))
 
@@ -1625,9 +2093,11 @@ async def api_gmail_fetch_start(
 
 
 @app.get("/api/gmail/fetch/status/{job_id}", response_class=HTMLResponse, name="api_gmail_fetch_status")
-def api_gmail_fetch_status(request: Request, job_id: str) -> HTMLResponse:
+def api_gmail_fetch_status(request: Request, job_id: str, v: str = "") -> HTMLResponse:
     job = FETCH_JOBS.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="job not found")
+    if v and v == _job_version(job):
+        return Response(status_code=204)
     return templates.TemplateResponse("partials/fetch_status.html", {"request": request, "job": job})
 